@@ -18,9 +18,12 @@ data = np.loadtxt(datapath,
                   delimiter=',', skiprows=2, usecols=(1,2,4))
 
 # Split load, solar and wind data:
-Pload = data[:,0] # kW
-Ppv1k = data[:,1] / 1000; # convert to kW/kWp
-wind_speed = data[:,2]; # m/s
+# one contiguous row per series (columns of `data` are strided views)
+data = np.ascontiguousarray(data.T)
+data[1] /= 1000 # convert solar data to kW/kWp (in place, no extra array)
+Pload = data[0] # kW
+Ppv1k = data[1] # kW/kWp
+wind_speed = data[2]; # m/s
 
 # Calibrate wind speed data against a mast measurement
 ws_gain = 1.059 # ratio of Mast's mean /PVGIS' mean
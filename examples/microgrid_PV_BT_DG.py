@@ -19,12 +19,25 @@ import microgrids as mgs
 print(__file__)
 folder = Path(__file__).parent
 datapath = folder / 'data' / 'Ouessant_data_2016.csv'
-data = np.loadtxt(datapath,
-                  delimiter=',', skiprows=2, usecols=(1,2))
+# parsed CSV data is cached in a .npy binary file, which loads much faster
+cachepath = datapath.with_suffix('.npy')
+if cachepath.exists() and cachepath.stat().st_mtime >= datapath.stat().st_mtime:
+    data = np.load(cachepath)
+else:
+    data = np.loadtxt(datapath,
+                      delimiter=',', skiprows=2, usecols=(1,2),
+                      dtype=np.float32) # float32 halves memory traffic in simulations
+    try:
+        np.save(cachepath, data)
+    except OSError: # e.g. read-only data folder: no cache
+        pass
 
 # Split load and solar data:
-Pload = data[:,0] # kW
-Ppv1k =  data[:,1] / 1000; # convert to kW/kWp
+# one contiguous row per series (columns of `data` are strided views)
+data = np.ascontiguousarray(data.T)
+data[1] /= 1000 # convert solar data to kW/kWp (in place, no extra array)
+Pload = data[0] # kW
+Ppv1k = data[1] # kW/kWp
 
 
 ## Create Microgrid project and its components
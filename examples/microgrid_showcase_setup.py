@@ -5,6 +5,7 @@
 
 from pathlib import Path
 from functools import lru_cache
+import hashlib
 
 import numpy as np
 from matplotlib import pyplot as plt
@@ -18,12 +19,25 @@ import microgrids as mgs
 print(__file__)
 folder = Path(__file__).parent
 datapath = folder / 'data' / 'Ouessant_data_2016.csv'
-data = np.loadtxt(datapath,
-                  delimiter=',', skiprows=2, usecols=(1,2))
+# parsed CSV data is cached in a .npy binary file, which loads much faster
+cachepath = datapath.with_suffix('.npy')
+if cachepath.exists() and cachepath.stat().st_mtime >= datapath.stat().st_mtime:
+    data = np.load(cachepath)
+else:
+    data = np.loadtxt(datapath,
+                      delimiter=',', skiprows=2, usecols=(1,2),
+                      dtype=np.float32) # float32 halves memory traffic in simulations
+    try:
+        np.save(cachepath, data)
+    except OSError: # e.g. read-only data folder: no cache
+        pass
 
 # Split load and solar data:
-Pload = data[:,0] # kW
-Ppv1k =  data[:,1] / 1000; # convert to kW/kWp
+# one contiguous row per series (columns of `data` are strided views)
+data = np.ascontiguousarray(data.T)
+data[1] /= 1000 # convert solar data to kW/kWp (in place, no extra array)
+Pload = data[0] # kW
+Ppv1k = data[1] # kW/kWp
 
 
 ## Create Microgrid project and its components
@@ -65,25 +79,39 @@ lifetime_pv = 25. # lifetime (y)
 derating_factor_pv = 1.0 # derating factor (or performance ratio) ∈ [0,1]"
 
 
-def interactive_mg(power_rated_gen, power_rated_pv, energy_rated_sto):
-    """Create Microgrid which includes Generator,
-    PV plant and Battery with given ratings"""
-    generator = mgs.DispatchableGenerator(power_rated_gen,
+# Components of given ratings are cached, since interactive widgets
+# only change one rating at a time (components are immutable, hence shareable)
+
+@lru_cache(maxsize=256)
+def _make_generator(power_rated_gen):
+    return mgs.DispatchableGenerator(power_rated_gen,
         fuel_intercept, fuel_slope, fuel_price,
         investment_price_gen, om_price_gen,
         lifetime_gen
     )
 
-    battery = mgs.Battery(energy_rated_sto,
+@lru_cache(maxsize=256)
+def _make_battery(energy_rated_sto):
+    return mgs.Battery(energy_rated_sto,
         investment_price_sto, om_price_sto,
         lifetime_sto, lifetime_cycles,
         charge_rate_max, discharge_rate_max,
         loss_factor_sto)
 
-    photovoltaic = mgs.Photovoltaic(power_rated_pv, irradiance,
+@lru_cache(maxsize=256)
+def _make_pv(power_rated_pv):
+    return mgs.Photovoltaic(power_rated_pv, irradiance,
         investment_price_pv, om_price_pv,
         lifetime_pv, derating_factor_pv)
 
+
+def interactive_mg(power_rated_gen, power_rated_pv, energy_rated_sto):
+    """Create Microgrid which includes Generator,
+    PV plant and Battery with given ratings"""
+    generator = _make_generator(power_rated_gen)
+    battery = _make_battery(energy_rated_sto)
+    photovoltaic = _make_pv(power_rated_pv)
+
     microgrid = mgs.Microgrid(project, Pload,
         generator, battery,
         {'Solar PV': photovoltaic}
@@ -91,13 +119,47 @@ def interactive_mg(power_rated_gen, power_rated_pv, energy_rated_sto):
     return microgrid
 
 
-@lru_cache(maxsize=1000)
-def cached_oper_costs(power_rated_gen, power_rated_pv, energy_rated_sto):
+# Persistent (on-disk) cache of simulation results, if joblib is available
+# (it is not in JupyterLite): results survive kernel restarts.
+try:
+    from joblib import Memory
+    disk_cache = Memory(folder / '.mg_cache', verbose=0).cache
+except ImportError:
+    disk_cache = lambda func: func # no persistent cache
+
+def _data_key():
+    """fingerprint of input data and parameters, to invalidate the disk cache"""
+    h = hashlib.sha1(Pload.tobytes())
+    h.update(np.asarray(irradiance).tobytes())
+    h.update(repr((mgs.__version__, project,
+        fuel_intercept, fuel_slope, fuel_price,
+        investment_price_gen, om_price_gen, lifetime_gen,
+        investment_price_sto, om_price_sto, lifetime_sto, lifetime_cycles,
+        charge_rate_max, discharge_rate_max, loss_factor_sto,
+        investment_price_pv, om_price_pv, lifetime_pv, derating_factor_pv
+    )).encode())
+    return h.hexdigest()
+
+@disk_cache
+def _disk_cached_oper_costs(power_rated_gen, power_rated_pv, energy_rated_sto, data_key):
     microgrid = interactive_mg(power_rated_gen, power_rated_pv, energy_rated_sto)
     oper_stats = mgs.sim_operation(microgrid)
     mg_costs = mgs.sim_economics(microgrid, oper_stats)
     return oper_stats, mg_costs
 
+@lru_cache(maxsize=1000)
+def _cached_oper_costs(power_rated_gen, power_rated_pv, energy_rated_sto):
+    return _disk_cached_oper_costs(power_rated_gen, power_rated_pv, energy_rated_sto,
+                                   _data_key())
+
+def cached_oper_costs(power_rated_gen, power_rated_pv, energy_rated_sto):
+    """Microgrid simulation, with in-memory and on-disk caching.
+
+    Ratings are rounded to 1 W so that near identical values share cache entries.
+    """
+    return _cached_oper_costs(round(power_rated_gen, 3), round(power_rated_pv, 3),
+                              round(energy_rated_sto, 3))
+
 
 def interactive_energy_mix(PV_power=0., Batt_energy=0.):
     """display energy mix with given ratings"""
@@ -11,9 +11,11 @@ from . import operation
 from . import economics
 from . import plotting
 
-from .components import *
-from .operation import *
-from .economics import *
+from .components import (Microgrid, Project,
+    DispatchableGenerator, Battery,
+    Photovoltaic, WindPower)
+from .operation import TrajRecorder, sim_operation, sim_operation_batch
+from .economics import sim_economics
 
 # Top-level Microgrid simulation function.
 def simulate(mg: Microgrid, recorder: TrajRecorder | None = None) -> tuple[
@@ -25,10 +27,7 @@ def simulate(mg: Microgrid, recorder: TrajRecorder | None = None) -> tuple[
     Returns:
     - Operational statistics from `sim_operation`
     - Microgrid project costs from `sim_economics`
-    """
-    oper_stats = sim_operation(mg, recorder)
-    mg_costs = sim_economics(mg, oper_stats)
-    return oper_stats, mg_costs
 
-# add as Microgrid's method for convenience
-setattr(Microgrid, 'simulate', simulate)
\ No newline at end of file
+    (same as `mg.simulate(recorder)`)
+    """
+    return mg.simulate(recorder)
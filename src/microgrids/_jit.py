@@ -0,0 +1,92 @@
+""" Optional Just-In-Time compilation of numerical kernels with Numba
+
+Numba is an optional dependency. When it is not installed,
+`njit` is a no-op decorator and `prange` is `range`,
+so that kernels run as plain Python code.
+
+When it is installed, Numba is imported lazily: `njit` kernels are compiled
+(or loaded from Numba's on-disk cache) at their first call, so that
+importing `microgrids` doesn't pay the import time of Numba (about 1–2 s).
+The first simulation of a session thus takes about one extra second with
+a warm cache (a few seconds the very first time, when kernels are compiled).
+Numba can be disabled with its standard environment variable
+`NUMBA_DISABLE_JIT=1`: it is then not imported at all, and kernels use
+their NumPy (or plain Python) implementations, as when Numba is not installed.
+"""
+# Copyright (c) 2022, Evelise de G. Antunes, Nabil Sadou and Pierre Haessig
+# Distributed under the terms of the MIT License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+
+import functools
+import importlib.util
+import os
+
+
+def _jit_disabled() -> bool:
+    """True if JIT compilation is disabled with `NUMBA_DISABLE_JIT`
+    (parsed like Numba does: any non zero integer)"""
+    try:
+        return int(os.environ.get('NUMBA_DISABLE_JIT', '0')) != 0
+    except ValueError:
+        return False
+
+try:
+    HAS_NUMBA = (not _jit_disabled()
+                 and importlib.util.find_spec('numba') is not None)
+except (ImportError, ValueError): # e.g. `sys.modules['numba'] = None`
+    HAS_NUMBA = False
+
+prange = range
+"""`numba.prange` in compiled kernels (`range` in plain Python)"""
+
+
+class _LazyJit:
+    """function compiled with `numba.njit(**options)` at its first call
+
+    Once compiled, the Numba dispatcher replaces the function in its module,
+    and it is also used by the kernels which call it.
+    """
+    def __init__(self, py_func, options):
+        self.py_func = py_func
+        self.options = options
+        self._dispatcher = None
+        functools.update_wrapper(self, py_func)
+
+    def compile(self):
+        """Numba dispatcher of the function (created at first use)"""
+        if self._dispatcher is None:
+            try:
+                import numba
+            except ImportError: # (broken installation): plain Python
+                self._dispatcher = self.py_func
+                return self._dispatcher
+            # Global names used by the function should be compiled objects:
+            # other kernels, and `prange` (Numba resolves globals at compilation)
+            func_globals = self.py_func.__globals__
+            for name in self.py_func.__code__.co_names:
+                obj = func_globals.get(name)
+                if isinstance(obj, _LazyJit):
+                    func_globals[name] = obj.compile()
+                elif obj is prange:
+                    func_globals[name] = numba.prange
+            self._dispatcher = numba.njit(**self.options)(self.py_func)
+            # (bypass this wrapper in later calls from the module)
+            if func_globals.get(self.py_func.__name__) is self:
+                func_globals[self.py_func.__name__] = self._dispatcher
+        return self._dispatcher
+
+    def __call__(self, *args):
+        return self.compile()(*args)
+
+
+def njit(*args, **kwargs):
+    """lazy `numba.njit` (used as `@njit` or `@njit(...)`),
+    or no-op decorator when Numba is not available"""
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return njit()(args[0])
+
+    def decorator(func):
+        if HAS_NUMBA:
+            return _LazyJit(func, kwargs)
+        return func
+    return decorator
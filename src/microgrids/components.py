@@ -6,19 +6,114 @@ also include `production` methods for non-dispatchable sources
 # Distributed under the terms of the MIT License.
 # The full license is in the file LICENSE.txt, distributed with this software.
 
-from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Protocol, TYPE_CHECKING
 
+import math
 from math import inf
 import numpy as np
 import numpy.typing as npt
 
+from ._jit import HAS_NUMBA, njit
+
+if TYPE_CHECKING: # (modules importing `components`)
+    from .operation import OperationStats, TrajRecorder
+    from .economics import MicrogridCosts
+
 __all__ = ['Microgrid', 'Project',
     'DispatchableGenerator', 'Battery',
     'Photovoltaic', 'WindPower']
 
 
-@dataclass
+# Component dataclasses are frozen: their derived attributes (computed in
+# `__post_init__`, or cached at first use) are set with `object.__setattr__`.
+
+def _as_float_array(x: npt.ArrayLike) -> np.ndarray:
+    """time series `x` as a read-only copy, C-contiguous and floating point
+    (float32 data is kept as is, other types are converted to float64)
+
+    The copy ensures that the values derived from the time series at creation
+    (e.g. cached productions) stay consistent, even if the caller later
+    modifies its array in place.
+    """
+    x = np.asarray(x)
+    dtype = np.float32 if x.dtype == np.float32 else np.float64
+    x = np.array(x, dtype=dtype, order='C', copy=True)
+    x.setflags(write=False)
+    return x
+
+
+# Numerical kernels (JIT-compiled if Numba is available, NumPy ufuncs otherwise)
+
+if HAS_NUMBA:
+    @njit(fastmath=True, cache=True)
+    def _scale_profile(profile, scale, out):
+        """write `scale*profile` to `out` (1D arrays)"""
+        for i in range(profile.size):
+            out[i] = scale*profile[i]
+
+    @njit(fastmath=True, cache=True)
+    def _weighted_sum(profiles, scales):
+        """weighted sum `scales @ profiles` of the rows of 2D array `profiles`"""
+        n, K = profiles.shape
+        out = np.zeros(K)
+        for i in range(n):
+            for k in range(K):
+                out[k] += scales[i]*profiles[i,k]
+        return out
+
+    @njit(cache=True)
+    def _wind_capacity_factor(v, k, α, v_out, out):
+        """write to `out` the capacity factor for wind speeds `v` (1D arrays),
+        with `k` the power coefficient (see `WindPower.capacity_from_wind`)"""
+        for i in range(v.size):
+            x = v[i]
+            if 0.0 < x <= v_out:
+                # Normalized power from the wind, without saturation:
+                c = k*x*x*x
+                # saturation using a smooth min(1,c) based on LogSumExp:
+                # -log(exp(-α) + exp(-α*c)) / α
+                c = min(1.0, c) - math.log1p(math.exp(-α*abs(1.0 - c))) / α
+                # saturate negative values (due to the smooth min)
+                out[i] = max(c, 0.0)
+            else: # no wind, cut-out wind speed (or NaN): zero, without exp/log
+                out[i] = 0.0
+else:
+    def _scale_profile(profile, scale, out):
+        """write `scale*profile` to `out` (1D arrays)"""
+        np.multiply(profile, scale, out=out)
+
+    def _weighted_sum(profiles, scales):
+        """weighted sum `scales @ profiles` of the rows of 2D array `profiles`"""
+        return scales @ profiles
+
+    def _wind_capacity_factor(v, k, α, v_out, out):
+        """write to `out` the capacity factor for wind speeds `v` (1D arrays),
+        with `k` the power coefficient (see `WindPower.capacity_from_wind`)"""
+        # Normalized power from the wind, without saturation:
+        # (v*v*v is much faster than the generic np.power)
+        np.multiply(v, v, out=out)
+        out *= v
+        out *= k
+        # saturation using a smooth min(1,cf) based on LogSumExp:
+        # -log(exp(-α) + exp(-α*cf)) / α
+        # = min(1,cf) - log1p(exp(-α*|1-cf|)) / α (bounded exp argument)
+        d = out - 1.0
+        np.abs(d, out=d)
+        d *= -α
+        np.exp(d, out=d)
+        np.log1p(d, out=d)
+        d /= α
+        np.minimum(out, 1.0, out=out)
+        out -= d
+        # saturate negative values (due to the smooth min)
+        np.maximum(out, 0.0, out=out)
+        # Cut-out wind speed:
+        out[~(v <= v_out)] = 0.0
+
+
+@dataclass(frozen=True, slots=True)
 class Microgrid:
     """Microgrid system description"""
     project: 'Project'
@@ -29,12 +124,88 @@ class Microgrid:
     "dispatchable generator"
     storage: 'Battery'
     "energy storage (e.g. battery)"
-    nondispatchables: dict[str, 'NonDispatchableSource']
-    "non-dispatchable sources (e.g. renewables like wind and solar)"
+    nondispatchables: Mapping[str, 'NonDispatchableSource']
+    "non-dispatchable sources (e.g. renewables like wind and solar), stored as a read-only mapping"
+
+    load_max: float = field(init=False, repr=False, compare=False)
+    "peak of the desired load (kW), computed at creation (0 for an empty load)"
+
+    # Names and non-dispatchable sources as tuples, for iteration
+    _nd_names: tuple[str, ...] = field(init=False, repr=False, compare=False)
+    _nd_sources: tuple['NonDispatchableSource', ...] = field(init=False, repr=False, compare=False)
+    # Production profiles of non-dispatchable sources, stacked at construction
+    _renew_mat: np.ndarray = field(init=False, repr=False, compare=False)
+    _renew_scales: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'load', _as_float_array(self.load))
+        object.__setattr__(self, 'load_max',
+                           float(np.max(self.load)) if self.load.size else 0.0)
+        # (read-only copy: sources are fixed, since their productions are stacked below)
+        object.__setattr__(self, 'nondispatchables',
+                           MappingProxyType(dict(self.nondispatchables)))
+        object.__setattr__(self, '_nd_names', tuple(self.nondispatchables.keys()))
+        object.__setattr__(self, '_nd_sources', tuple(self.nondispatchables.values()))
+        self._build_renew_matrix()
+
+    def __reduce__(self):
+        # (mapping proxies are not picklable: Microgrid is rebuilt from its parameters)
+        return (self.__class__, (self.project, self.load, self.generator, self.storage,
+                                 dict(self.nondispatchables)))
+
+    def _build_renew_matrix(self):
+        """stack the production profiles of non-dispatchable sources
+        as a 2D matrix (one row per source), along with their scaling factors,
+        so that total production is `_renew_scales @ _renew_mat`
+        (see `renewable_potential`)
+        """
+        profiles = []
+        scales = []
+        for nd in self._nd_sources:
+            # (optional `_profile_scale` method of the sources of this module,
+            # not part of the `NonDispatchableSource` interface)
+            profile_scale = getattr(nd, '_profile_scale', None)
+            if profile_scale is not None:
+                profile, scale = profile_scale()
+            else: # any other source, with only a `production` method
+                profile, scale = nd.production(), 1.0
+            profiles.append(profile)
+            scales.append(scale)
+        if profiles:
+            renew_mat = np.vstack(profiles)
+        else:
+            renew_mat = np.zeros((0, len(self.load)))
+        object.__setattr__(self, '_renew_mat', renew_mat)
+        object.__setattr__(self, '_renew_scales', np.array(scales, dtype=float))
+
+    @property
+    def renewable_productions(self) -> np.ndarray:
+        """production time series of non-dispatchable sources (kW), as a 2D array
+        with one row for each source, in the order of `nondispatchables`"""
+        return self._renew_scales[:, np.newaxis] * self._renew_mat
 
-    # `simulate`` method is defined in top-level __init__.py
+    def renewable_potential(self) -> np.ndarray:
+        """total production potential of non-dispatchable sources (kW)"""
+        return _weighted_sum(self._renew_mat, self._renew_scales)
 
-@dataclass
+    def simulate(self, recorder: 'TrajRecorder | None' = None
+                 ) -> tuple['OperationStats', 'MicrogridCosts']:
+        """Simulate the technical and economic performance of the Microgrid.
+
+        Operation time series are optionnaly recorded if `recorder` is a `TrajRecorder` instance.
+
+        Returns:
+        - Operational statistics from `sim_operation`
+        - Microgrid project costs from `sim_economics`
+        """
+        # (deferred imports: `operation` and `economics` modules import `components`)
+        from .operation import sim_operation
+        from .economics import sim_economics
+        oper_stats = sim_operation(self, recorder)
+        mg_costs = sim_economics(self, oper_stats)
+        return oper_stats, mg_costs
+
+@dataclass(frozen=True, slots=True)
 class Project:
     """Microgrid project information
 
@@ -53,7 +224,7 @@ class Project:
     "currency used in price parameters and computed costs"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class DispatchableGenerator:
     """Dispatchable power source (e.g. Diesel generator, Gas turbine, Fuel cell)"""
     # Main technical parameters
@@ -94,7 +265,7 @@ class DispatchableGenerator:
         return self.lifetime_hours / oper_hours # h / (h/y) → y
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Battery:
     """Battery energy storage (including AC/DC converter)
 
@@ -134,6 +305,22 @@ class Battery:
     salvage_price_ratio: float = 1.0
     "salvage price, relative to initial investment"
 
+    # Derived technical values (computed at creation)
+    energy_min: float = field(init=False, repr=False, compare=False)
+    "minimum energy level: minimum SoC × rated energy (kWh)"
+    energy_ini: float = field(init=False, repr=False, compare=False)
+    "initial energy level: initial SoC × rated energy (kWh)"
+    power_charge_max: float = field(init=False, repr=False, compare=False)
+    "max charge power: charge rate × rated energy (kW)"
+    power_discharge_max: float = field(init=False, repr=False, compare=False)
+    "max discharge power: discharge rate × rated energy (kW)"
+
+    def __post_init__(self):
+        object.__setattr__(self, 'energy_min', self.SoC_min * self.energy_rated)
+        object.__setattr__(self, 'energy_ini', self.SoC_ini * self.energy_rated)
+        object.__setattr__(self, 'power_charge_max', self.charge_rate * self.energy_rated)
+        object.__setattr__(self, 'power_discharge_max', self.discharge_rate * self.energy_rated)
+
     def lifetime(self, cycles : float) -> float:
         """effective lifetime (y), based on yearly operation `cycles`
         """
@@ -146,15 +333,30 @@ class Battery:
 
 # Non-dispatchable sources (e.g. renewables like wind and solar)
 
-class NonDispatchableSource(ABC):
-    """Base class for non-dispatchable sources (e.g. renewables like wind and solar)"""
+class NonDispatchableSource(Protocol):
+    """Interface of non-dispatchable sources (e.g. renewables like wind and solar)
+
+    Any object with a `production` method is a valid source (structural typing).
+    Subclassing is optional.
+    """
+    __slots__ = ()
 
-    @abstractmethod
     def production(self) -> np.ndarray:
         "production time series"
-        pass
-
-@dataclass
+        ...
+
+def _cached_production(source, profile: np.ndarray, scale: float) -> np.ndarray:
+    """production `scale*profile` of a source of this module,
+    computed on the first call and then cached (read-only)
+    in its `_prod_cache` attribute"""
+    if source._prod_cache is None:
+        power_output = np.empty_like(profile)
+        _scale_profile(profile, scale, power_output)
+        power_output.setflags(write=False)
+        object.__setattr__(source, '_prod_cache', power_output)
+    return source._prod_cache
+
+@dataclass(frozen=True, slots=True)
 class Photovoltaic(NonDispatchableSource):
     """Solar photovoltaic generator (including AC/DC converter)"""
     # Main technical parameters
@@ -181,12 +383,31 @@ class Photovoltaic(NonDispatchableSource):
     salvage_price_ratio: float = 1.0
     "salvage price, relative to initial investment"
 
+    # Internal precomputed values
+    _effective_power: float = field(init=False, repr=False, compare=False)
+    "effective rated power: derating factor × rated power (kW)"
+    _prod_cache: np.ndarray | None = field(default=None, init=False, repr=False, compare=False)
+    "cached production time series"
+
+    def __post_init__(self):
+        object.__setattr__(self, 'irradiance', _as_float_array(self.irradiance))
+        object.__setattr__(self, '_effective_power',
+                           self.derating_factor * self.power_rated)
+
     def production(self):
-        "PV production time series"
-        power_output = self.derating_factor * self.power_rated * self.irradiance
-        return power_output
+        """PV production time series
+
+        The returned array is computed on the first call and then cached
+        (it is thus read-only).
+        """
+        return _cached_production(self, self.irradiance, self._effective_power)
+
+    def _profile_scale(self) -> tuple[np.ndarray, float]:
+        """production profile and its scaling factor,
+        such that `production() = scale * profile`"""
+        return self.irradiance, self._effective_power
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class WindPower(NonDispatchableSource):
     """Wind power generator (simple model using a given capacity factor time series)"""
     # Main technical parameters
@@ -209,10 +430,25 @@ class WindPower(NonDispatchableSource):
     salvage_price_ratio: float = 1.0
     "salvage price, relative to initial investment"
 
+    # Internal precomputed values
+    _prod_cache: np.ndarray | None = field(default=None, init=False, repr=False, compare=False)
+    "cached production time series"
+
+    def __post_init__(self):
+        object.__setattr__(self, 'capacity_factor', _as_float_array(self.capacity_factor))
+
     def production(self):
-        "Wind power production time series"
-        power_output = self.power_rated * self.capacity_factor
-        return power_output
+        """Wind power production time series
+
+        The returned array is computed on the first call and then cached
+        (it is thus read-only).
+        """
+        return _cached_production(self, self.capacity_factor, self.power_rated)
+
+    def _profile_scale(self) -> tuple[np.ndarray, float]:
+        """production profile and its scaling factor,
+        such that `production() = scale * profile`"""
+        return self.capacity_factor, self.power_rated
 
     @staticmethod
     def capacity_from_wind(v: npt.ArrayLike,
@@ -235,12 +471,10 @@ class WindPower(NonDispatchableSource):
         Air is assumed to have fixed density ρ=1.225 kg/m³.
         """
         ρ = 1.225 # kg/m³ at 15°C
-        # Normalized power from the wind, without saturation:
-        cf = 0.5*Cp*ρ/TSP * v**3
-        # saturation using a smooth min based on LogSumExp
-        cf = -np.log(np.exp(-α) + np.exp(-α*cf)) / α
-        # saturate negative values (due to the smooth min)
-        cf = np.where(cf>=0,    cf, 0)
-        # Cut-out wind speed:
-        cf = np.where(v<=v_out, cf, 0)
-        return cf
\ No newline at end of file
+        v = np.asarray(v)
+        if v.dtype != np.float32 and v.dtype != np.float64:
+            # e.g. list of integers, float16: converted once to float64
+            v = v.astype(np.float64)
+        cf = np.empty(v.shape, dtype=v.dtype)
+        _wind_capacity_factor(v.ravel(), 0.5*Cp*ρ/TSP, α, v_out, cf.ravel())
+        return cf if cf.ndim else cf[()]
\ No newline at end of file
@@ -5,17 +5,160 @@
 # The full license is in the file LICENSE.txt, distributed with this software.
 
 from dataclasses import dataclass
+from typing import Iterable
 
-from math import inf
+from math import ceil, inf
 import numpy as np
+import numpy.typing as npt
 
+from ._jit import njit
 from .components import Microgrid, Project
 from .operation import OperationStats
 
 __all__ = ['sim_economics']
 
 
-@dataclass
+@njit(cache=True)
+def _sum_discounts(mg_lifetime: int, discount_rate: float) -> float:
+    """sum of the discount factors over the years of a project
+
+    (closed form of the geometric series ∑ 1/(1+r)^i for i in 1..`mg_lifetime`)
+    """
+    if discount_rate == 0.0:
+        return float(mg_lifetime)
+    return (1 - (1 + discount_rate)**(-mg_lifetime)) / discount_rate
+
+
+@njit(cache=True)
+def _sum_replacement_factors(lifetime: float, replacements_number: int,
+                             discount_rate: float) -> float:
+    """sum of the discount factors of the replacements of a component
+    of given `lifetime`, replaced `replacements_number` times
+
+    (closed form of the geometric series ∑ q^i for i in 1..`replacements_number`,
+    with q = 1/(1+r)^`lifetime` the discount factor of one component lifetime)
+    """
+    q = (1 + discount_rate)**(-lifetime)
+    if q == 1.0:
+        return float(replacements_number)
+    return q * (1 - q**replacements_number) / (1 - q)
+
+
+@njit(cache=True)
+def _lifetime_factors(mg_lifetime: float, discount_rate: float,
+                      lifetime: float) -> tuple[float, float]:
+    """discounting factors of a component of given `lifetime`,
+    within a project of lifetime `mg_lifetime`
+
+    Returns:
+    - sum of the discount factors of the replacements (replacement factor)
+    - ratio of the component remaining life at the project end (salvage ratio)
+    """
+    if lifetime < inf:
+        # number of replacements
+        replacements_number = ceil(mg_lifetime/lifetime) - 1
+
+        # discounting of the replacements
+        if replacements_number == 0:
+            replacement_factor = 0.0
+        else:
+            replacement_factor = _sum_replacement_factors(
+                lifetime, replacements_number, discount_rate)
+
+        # component remaining life at the project end
+        remaining_life = lifetime*(1+replacements_number) - mg_lifetime
+        salvage_ratio = remaining_life / lifetime
+
+    else: # Infinite lifetime (happens for components with zero usage)
+        replacement_factor = 0.0
+        salvage_ratio = 1.0 # component sold "as new"
+
+    return replacement_factor, salvage_ratio
+
+
+@njit(cache=True)
+def _component_costs(sum_discounts: float, last_discount: float,
+                     replacement_factor: float, salvage_ratio: float,
+                     quantity: float,
+                     investment_price: float, replacement_price: float,
+                     salvage_price: float, om_price: float,
+                     fuel_consumption: float, fuel_price: float
+                    ) -> tuple[float, float, float, float, float, float]:
+    """numerical core of `EconomicsEngine.cost_factors`
+
+    Returns the cost factors (total, investment, replacement, om, fuel, salvage).
+    """
+    ### Investment cost
+    investment_cost = investment_price * quantity
+
+    ### Operation & maintenance and fuel costs
+    om_cost = om_price * quantity * sum_discounts
+    fuel_cost = fuel_price * fuel_consumption * sum_discounts
+
+    ### Replacement and salvage:
+    # net present replacement cost
+    replacement_cost = replacement_price * quantity * replacement_factor
+    # net present salvage cost (<0),
+    # with unitary salvage cost proportional to remaining life
+    salvage_cost = -salvage_price * salvage_ratio * quantity * last_discount
+
+    ### Total
+    total_cost = investment_cost + replacement_cost + om_cost + fuel_cost + salvage_cost
+
+    return (total_cost, investment_cost, replacement_cost, om_cost, fuel_cost, salvage_cost)
+
+
+class EconomicsEngine:
+    """Cost calculator for the components of a Microgrid project
+
+    Discount factors of the project `mg_project` are computed once
+    at creation, and lifetime-dependent factors are cached for each
+    component lifetime.
+    """
+    __slots__ = ('project', 'sum_discounts', 'last_discount', '_lifetime_cache')
+
+    def __init__(self, mg_project: Project):
+        self.project = mg_project
+        mg_lifetime = float(mg_project.lifetime)
+        discount_rate = float(mg_project.discount_rate)
+        # sum of the discount factors for each year of the project
+        self.sum_discounts = _sum_discounts(mg_lifetime, discount_rate)
+        # discount factor of the last year of the project
+        self.last_discount = (1 + discount_rate)**(-mg_lifetime)
+        # replacement factor and salvage ratio, by component lifetime
+        self._lifetime_cache: dict[float, tuple[float, float]] = {}
+
+    def lifetime_factors(self, lifetime: float) -> tuple[float, float]:
+        """replacement factor and salvage ratio of a component of given `lifetime`
+        (see `_lifetime_factors`)"""
+        lifetime = float(lifetime)
+        factors = self._lifetime_cache.get(lifetime)
+        if factors is None:
+            factors = _lifetime_factors(float(self.project.lifetime),
+                float(self.project.discount_rate), lifetime)
+            self._lifetime_cache[lifetime] = factors
+        return factors
+
+    def cost_factors(self, quantity: float, lifetime: float,
+                     investment_price: float, replacement_price: float,
+                     salvage_price: float, om_price: float,
+                     fuel_consumption: float = 0.0, fuel_price: float = 0.0
+                    ) -> 'CostFactors':
+        """Cost factors for a single component of the project
+        (see `CostFactors.from_prices` for the meaning of parameters)"""
+        replacement_factor, salvage_ratio = self.lifetime_factors(lifetime)
+        # (float conversion to get a single compiled specialization)
+        costs = _component_costs(self.sum_discounts, self.last_discount,
+            replacement_factor, salvage_ratio,
+            float(quantity),
+            float(investment_price), float(replacement_price),
+            float(salvage_price), float(om_price),
+            float(fuel_consumption), float(fuel_price))
+        return CostFactors(*costs)
+# end EconomicsEngine class
+
+
+@dataclass(frozen=True, slots=True)
 class CostFactors:
     """Cost factors of a component or a set of components"""
     total: float = 0.0
@@ -51,55 +194,84 @@ class CostFactors:
 
         Returns the cost factors of the component.
         """
-        # Microgrid project parameters:
+        return EconomicsEngine(mg_project).cost_factors(quantity, lifetime,
+            investment_price, replacement_price, salvage_price, om_price,
+            fuel_consumption, fuel_price)
+
+    @staticmethod
+    def from_prices_batch(mg_project: Project,
+                          quantities: npt.ArrayLike, lifetimes: npt.ArrayLike,
+                          investment_prices: npt.ArrayLike, replacement_prices: npt.ArrayLike,
+                          salvage_prices: npt.ArrayLike, om_prices: npt.ArrayLike,
+                          fuel_consumptions: npt.ArrayLike = 0.0, fuel_prices: npt.ArrayLike = 0.0
+                         ) -> np.ndarray:
+        """Cost factors for several components, vectorized version of `from_prices`.
+
+        Parameters are arrays (or scalars, broadcasted) with the same meaning
+        as in `from_prices`, with one element for each component.
+
+        Returns the cost factors as a 2D array, with one row for each component
+        and columns in the order of `to_array`.
+        """
         mg_lifetime = mg_project.lifetime
-        # discount factor for each year of the project
-        discount_factors = [1/((1 + mg_project.discount_rate)**i)
-                            for i in range(1, mg_lifetime+1)]
-        sum_discounts = sum(discount_factors)
-
-        ### Investment cost
-        investment_cost = investment_price * quantity
-
-        ### Operation & maintenance and fuel costs
-        om_cost = om_price * quantity * sum_discounts
-        fuel_cost = fuel_price * fuel_consumption * sum_discounts
-
-        ### Replacement and salvage:
-        if lifetime < inf:
-            # number of replacements
-            replacements_number = int(np.ceil(mg_lifetime/lifetime)) - 1
-
-            # net present replacement cost
-            if replacements_number == 0:
-                replacement_cost = 0.0
-            else:
-                # years that the replacements happen
-                replacement_years = [i*lifetime for i in range(1, replacements_number+1)]
-                # discount factors for the replacement years
-                replacement_factors = [1/(1 + mg_project.discount_rate)**i for i in replacement_years]
-                replacement_cost = replacement_price * quantity * sum(replacement_factors)
-
-            # component remaining life at the project end
-            remaining_life = lifetime*(1+replacements_number) - mg_lifetime
-            # proportional unitary salvage cost given remaining life
-            salvage_price_effective = salvage_price * remaining_life / lifetime
-
-        else: # Infinite lifetime (happens for components with zero usage)
-            replacement_cost = 0.0
-            salvage_price_effective = salvage_price # component sold "as new"
-
-        # net present salvage cost (<0)
-        salvage_cost = -salvage_price_effective * quantity * discount_factors[mg_lifetime-1]
-
-        ### Total
-        total_cost = investment_cost + replacement_cost + om_cost + fuel_cost + salvage_cost
-
-        return cls(total_cost, investment_cost, replacement_cost, om_cost, fuel_cost, salvage_cost)
+        discount_rate = mg_project.discount_rate
+        quantities, lifetimes, investment_prices, replacement_prices, \
+        salvage_prices, om_prices, fuel_consumptions, fuel_prices = np.broadcast_arrays(
+            *(np.asarray(a, dtype=float) for a in (quantities, lifetimes,
+                investment_prices, replacement_prices, salvage_prices, om_prices,
+                fuel_consumptions, fuel_prices)))
+        sum_discounts = _sum_discounts(mg_lifetime, discount_rate)
+        last_discount = (1 + discount_rate)**(-mg_lifetime)
+
+        # Replacement factors and salvage ratios (see `_lifetime_factors`),
+        # with infinite lifetime: no replacement and component sold "as new"
+        finite = np.isfinite(lifetimes)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            replacements_number = np.where(finite, np.ceil(mg_lifetime/lifetimes) - 1, 0.0)
+            q = (1 + discount_rate)**(-lifetimes)
+            replacement_factors = np.where(q == 1.0, replacements_number,
+                q * (1 - q**replacements_number) / (1 - q))
+            remaining_life = lifetimes*(1+replacements_number) - mg_lifetime
+            salvage_ratios = np.where(finite, remaining_life / lifetimes, 1.0)
+
+        costs = np.empty(quantities.shape + (6,))
+        costs[..., 1] = investment_prices * quantities
+        costs[..., 2] = replacement_prices * quantities * replacement_factors
+        costs[..., 3] = om_prices * quantities * sum_discounts
+        costs[..., 4] = fuel_prices * fuel_consumptions * sum_discounts
+        costs[..., 5] = -salvage_prices * salvage_ratios * quantities * last_discount
+        costs[..., 0] = costs[..., 1:].sum(axis=-1)
+        return costs
+
+    def to_array(self) -> np.ndarray:
+        """cost factors as a Numpy vector, in the order of the fields
+        (total, investment, replacement, om, fuel, salvage)"""
+        return np.array((
+            self.total,
+            self.investment,
+            self.replacement,
+            self.om,
+            self.fuel,
+            self.salvage
+        ))
+
+    @classmethod
+    def sum(cls, costs: Iterable['CostFactors']) -> 'CostFactors':
+        """sum of the cost factors of several components, factor by factor
+        (without intermediate `CostFactors` instances)"""
+        total = investment = replacement = om = fuel = salvage = 0.0
+        for c in costs:
+            total += c.total
+            investment += c.investment
+            replacement += c.replacement
+            om += c.om
+            fuel += c.fuel
+            salvage += c.salvage
+        return cls(total, investment, replacement, om, fuel, salvage)
 
     def __add__(self, other : 'CostFactors'):
         """sum of two `CostFactors` is the sum of their factors"""
-        if type(other) == CostFactors:
+        if isinstance(other, CostFactors):
             return CostFactors(
                 self.total + other.total,
                 self.investment + other.investment,
@@ -113,7 +285,7 @@ class CostFactors:
 # end CostFactors class
 
 
-@dataclass
+@dataclass(slots=True)
 class MicrogridCosts:
     """Cost factors of each component of a Microgrid
 
@@ -139,29 +311,15 @@ class MicrogridCosts:
         cmat_rows = ['Generator', 'Storage'] + \
             [nd_name for nd_name in self.nondispatchables] + \
             ['All components']
-        nr = len(cmat_rows)
         # Columns
         cmat_cols = ["Investment", "Replacement", "O&M", "Fuel", "Salvage", "Total by component"]
-        nc = len(cmat_cols)
-        cmat = np.zeros((nr,nc))
-
-        def costs_to_vec(c: CostFactors):
-            """cost factors to Numpy vector"""
-            return np.array((
-                c.investment,
-                c.replacement,
-                c.om,
-                c.fuel,
-                c.salvage,
-                c.total
-            ))
-
         # Fill in the cost table, one row for each component
-        cmat[0,:] = costs_to_vec(self.generator)
-        cmat[1,:] = costs_to_vec(self.storage)
-        for i, ndc in enumerate(self.nondispatchables.values()):
-            cmat[2+i,:] = costs_to_vec(ndc)
-        cmat[nr-1,:] = costs_to_vec(self.system)
+        components = [self.generator, self.storage] + \
+            list(self.nondispatchables.values()) + \
+            [self.system]
+        cmat = np.stack([c.to_array() for c in components])
+        # reorder columns: total comes last
+        cmat = cmat[:, [1, 2, 3, 4, 5, 0]]
 
         return cmat, cmat_rows, cmat_cols
 # end MicrogridCosts
@@ -171,6 +329,9 @@ def sim_economics(mg: Microgrid, oper_stats: OperationStats) -> MicrogridCosts:
     """evaluate economic performance of Microgrid `mg`,
     based on its operation statistics `oper_stats` (from `sim_operation`).
     """
+    # Discount factors of the project, shared by all components
+    engine = EconomicsEngine(mg.project)
+
     # Dispatchable generator
     gen = mg.generator
     quantity = gen.power_rated
@@ -179,8 +340,8 @@ def sim_economics(mg: Microgrid, oper_stats: OperationStats) -> MicrogridCosts:
     salvage_price = gen.investment_price * gen.salvage_price_ratio
     om_price = gen.om_price_hours * oper_stats.gen_hours # $/h × h/y → $/y
 
-    gen_costs = CostFactors.from_prices(
-        mg.project, quantity, lifetime,
+    gen_costs = engine.cost_factors(
+        quantity, lifetime,
         gen.investment_price, replacement_price, salvage_price, om_price,
         oper_stats.gen_fuel, gen.fuel_price
     )
@@ -192,31 +353,30 @@ def sim_economics(mg: Microgrid, oper_stats: OperationStats) -> MicrogridCosts:
     replacement_price = sto.investment_price * sto.replacement_price_ratio
     salvage_price = sto.investment_price * sto.salvage_price_ratio
 
-    sto_costs = CostFactors.from_prices(
-        mg.project, quantity, lifetime,
+    sto_costs = engine.cost_factors(
+        quantity, lifetime,
         sto.investment_price, replacement_price,
         salvage_price, sto.om_price
     )
 
     # Non-dispatchable sources (e.g. renewables like wind and solar)
     nd_costs: dict[str, CostFactors] = {}
-    for name, nd in mg.nondispatchables.items():
+    for name, nd in zip(mg._nd_names, mg._nd_sources):
         quantity = nd.power_rated
         replacement_price = nd.investment_price * nd.replacement_price_ratio
         salvage_price = nd.investment_price * nd.salvage_price_ratio
 
-        nd_costs[name] = CostFactors.from_prices(
-            mg.project, quantity, nd.lifetime,
+        nd_costs[name] = engine.cost_factors(
+            quantity, nd.lifetime,
             nd.investment_price, replacement_price,
             salvage_price, nd.om_price,
         )
 
     # Capital recovery factor (CRF)
-    discount_factors = [1/((1 + mg.project.discount_rate)**i)
-                        for i in range(1, mg.project.lifetime+1)]
-    crf = 1/sum(discount_factors)
+    crf = 1/engine.sum_discounts
     # Cost of all components and NPC of the project
-    system_costs = gen_costs + sto_costs + sum(nd_costs.values(), start=CostFactors())
+    components_costs = [gen_costs, sto_costs, *nd_costs.values()]
+    system_costs = CostFactors.sum(components_costs)
     npc = system_costs.total
     # levelized cost of energy
     annualized_cost = npc*crf # $/y
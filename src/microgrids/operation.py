@@ -4,16 +4,18 @@
 # Distributed under the terms of the MIT License.
 # The full license is in the file LICENSE.txt, distributed with this software.
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Sequence
 
 import numpy as np
 
+from ._jit import HAS_NUMBA, njit, prange
 from .components import Microgrid
 
-__all__ = ['TrajRecorder', 'sim_operation']
+__all__ = ['TrajRecorder', 'sim_operation', 'sim_operation_batch']
 
 
-@dataclass
+@dataclass(slots=True)
 class OperationStats:
     """Aggregated statistics over the simulated Microgrid operation
 
@@ -66,29 +68,49 @@ class OperationStats:
     "ratio of energy actually supplied by renewables (net of storage loss) to the energy served to the load (∈ [0,1])"
 
 
-class TrajRecorder:
-    """Recorder for trajectories of operational variables"""
-    def init(self, **kwargs: dict[str,int]):
-        """initialize arrays to record values of prescribed length
-
-        Example: rec.init(var1=10, var2=11)
-        """
-        for name,length in kwargs.items():
-            vector = np.zeros(length)
-            self.__setattr__(name, vector)
-
-    def rec(self, k:int, **kwargs: dict[str,int]):
-        """record values at index `k`.
-
-        `k` should be in [0, `length`−1], for the given `length` provided in `init`.
-
-        Example: rec.rec(5, var1=0.8)
-        """
-        for name,value in kwargs.items():
-            vector = self.__getattribute__(name)
-            vector[k] = value
+def _empty() -> np.ndarray:
+    """empty array (default trajectory, before simulation)"""
+    return np.zeros(0)
 
+@dataclass(eq=False, slots=True)
+class TrajRecorder:
+    """Recorder for trajectories of operational variables
 
+    Trajectories are arrays of length K, the number of simulated
+    instants (K+1 for `Esto`, which includes the final state).
+    They are (re)allocated when passed to `sim_operation`.
+    """
+    Prep: np.ndarray = field(default_factory=_empty)
+    "production potential of non-dispatchable sources (kW)"
+    Pgen: np.ndarray = field(default_factory=_empty)
+    "power supplied by the dispatchable generator (kW)"
+    Psto: np.ndarray = field(default_factory=_empty)
+    "power supplied by the energy storage (kW, <0 when charging)"
+    Esto: np.ndarray = field(default_factory=_empty)
+    "energy stored at the beginning of each instant (kWh)"
+    Pspill: np.ndarray = field(default_factory=_empty)
+    "spilled power (kW)"
+    Pshed: np.ndarray = field(default_factory=_empty)
+    "shed power from the load (kW)"
+
+    @classmethod
+    def allocate(cls, K: int) -> 'TrajRecorder':
+        """recorder with arrays allocated for `K` instants"""
+        recorder = cls()
+        recorder.init(K)
+        return recorder
+
+    def init(self, K: int):
+        """(re)allocate arrays to record `K` instants"""
+        self.Prep = np.zeros(K)
+        self.Pgen = np.zeros(K)
+        self.Psto = np.zeros(K)
+        self.Esto = np.zeros(K+1)
+        self.Pspill = np.zeros(K)
+        self.Pshed = np.zeros(K)
+
+
+@njit(cache=True)
 def dispatch(Pnl_req, Psto_cmax, Psto_dmax, Pgen_max) -> tuple[float, float, float, float]:
     """Energy dispatch decision for a "load-following-style" strategy.
 
@@ -157,119 +179,298 @@ def dispatch(Pnl_req, Psto_cmax, Psto_dmax, Pgen_max) -> tuple[float, float, flo
     return Pgen, Psto, Pspill, Pshed
 
 
-def sim_operation(mg: Microgrid, recorder: TrajRecorder | None = None) -> OperationStats:
-    """Simulate the operation of Microgrid project `mg`.
+@njit(cache=True, boundscheck=False)
+def _sim_operation_kernel(Pnl_request, Psto_pmax, Psto_pmin, Esto_max, Esto_min,
+                          sto_loss, Esto_ini, Pgen_rated, dt,
+                          Pgen_traj, Psto_traj, Esto_traj, Pspill_traj, Pshed_traj):
+    """Operation simulation loop of `sim_operation`, on plain floats and arrays.
 
-    Operation time series are optionnaly recorded if `recorder` is a `TrajRecorder` instance.
+    Trajectories are written to the preallocated arrays `Pgen_traj`, `Psto_traj`,
+    `Esto_traj` (of length K+1), `Pspill_traj` and `Pshed_traj`.
 
-    Returns operational statistics.
+    Returns the maximum consecutive duration of load shedding
+    (the only sequential statistic) and the final storage energy.
+    Other statistics are reductions of the trajectories (see `sim_operation`).
     """
-    # Renewable power generation
-    # (remark on naming convention: all non-dispatchable sources are assumed renewable!)
-    renew_productions = [nd.production() for nd in mg.nondispatchables.values()]
-    renew_potential = sum(renew_productions)
-
-    # Desired net load
-    Pnl_request = mg.load - renew_potential
-
-    # Fixed parameters and short aliases
-    K = len(mg.load)
-    dt = mg.project.timestep
-    Psto_pmax =  mg.storage.discharge_rate * mg.storage.energy_rated
-    Psto_pmin = -mg.storage.charge_rate * mg.storage.energy_rated # <0 in line with the generator convention for Psto
-    Esto_max = mg.storage.energy_rated
-    Esto_min = mg.storage.SoC_min * mg.storage.energy_rated
-    sto_loss = mg.storage.loss_factor
-
-
-    # Initialization of loop variables
-    # Initial storage state
-    Esto_ini = mg.storage.SoC_ini * mg.storage.energy_rated
-    Esto = Esto_ini
-    # Operation statistics counters initialiazed at zero
-    op_st = OperationStats()
+    K = len(Pnl_request)
+    shed_duration_max = 0.0
     shed_duration = 0.0 # duration of current load shedding event (h)
 
-    if recorder:
-        recorder.init(Prep=K, Pgen=K, Psto=K, Esto=K+1, Pspill=K, Pshed=K)
-
+    Esto = Esto_ini
+    # Storage energy to power conversion factors (loop invariant)
+    inv_charge = 1.0 / ((1 - sto_loss) * dt)
+    inv_discharge = 1.0 / ((1 + sto_loss) * dt)
 
-    ### Operation simulation loop
     for k in range(K):
 
         ### Decide energy dispatch
 
         # Storage energy and power limits (TODO: move to dispatch)
-        Psto_emin = - (Esto_max - Esto) / ((1 - sto_loss) * dt)
-        Psto_emax = (Esto - Esto_min) / ((1 + sto_loss) * dt)
+        Psto_emin = - (Esto_max - Esto) * inv_charge
+        Psto_emax = (Esto - Esto_min) * inv_discharge
         Psto_dmax = min(Psto_emax, Psto_pmax)
         Psto_cmax = max(Psto_emin, Psto_pmin)
 
         Pgen, Psto, Pspill, Pshed = dispatch(
             Pnl_request[k],
             Psto_cmax, Psto_dmax,
-            mg.generator.power_rated)
+            Pgen_rated)
 
-        if recorder:
-            recorder.rec(k,
-                Prep=renew_potential[k],
-                Pgen=Pgen, Psto=Psto, Esto=Esto,
-                Pspill=Pspill, Pshed=Pshed)
+        Pgen_traj[k] = Pgen
+        Psto_traj[k] = Psto
+        Esto_traj[k] = Esto
+        Pspill_traj[k] = Pspill
+        Pshed_traj[k] = Pshed
 
         # Storage dynamics
         Esto = Esto - (Psto + sto_loss*abs(Psto))*dt
 
-        ### Aggregate operation statistics
-
-        # Load statistics
-        op_st.shed_energy += Pshed*dt
-        op_st.shed_max = max(op_st.shed_max, Pshed)
+        # Maximum duration of load shedding
         if Pshed > 0.0:
-            op_st.shed_hours += dt
             shed_duration += dt
-            op_st.shed_duration_max = max(op_st.shed_duration_max, shed_duration)
+            shed_duration_max = max(shed_duration_max, shed_duration)
         else:
             # reset duration of current load shedding event
             shed_duration = 0.0
+    # end for each instant k
 
-        # Dispatchable generator statistics
-        if Pgen > 0.0: # Generator ON
-            op_st.gen_energy += Pgen*dt
-            op_st.gen_hours += dt
-            fuel_rate = mg.generator.fuel_intercept * mg.generator.power_rated +\
-                          mg.generator.fuel_slope * Pgen # (L/h)
-            op_st.gen_fuel += fuel_rate*dt
-
-        # Energy storage (e.g. battery) statistics
-        if Psto > 0.0: # discharge
-            op_st.storage_dis_energy += Psto*dt
-        else:
-            op_st.storage_char_energy -= Psto*dt
+    Esto_traj[K] = Esto # Esto at last instant
 
-        # Non-dispatchable (typ. renewables) sources statistics
-        op_st.spilled_energy += Pspill*dt
-        op_st.spilled_max = max(op_st.spilled_max, Pspill)
-    # end for each instant k
+    return shed_duration_max, Esto
 
-    if recorder:
-        recorder.rec(K, Esto=Esto)# Esto at last instant
+
+def _max_run_duration(mask: np.ndarray, dt: float) -> float:
+    """maximum duration of consecutive True values of 1D boolean array `mask`,
+    for a time step `dt`"""
+    # (indices where runs start and end)
+    edges = np.flatnonzero(np.diff(mask, prepend=False, append=False))
+    if len(edges) == 0:
+        return 0.0
+    return float(np.max(edges[1::2] - edges[0::2]))*dt
+
+
+def _dispatch_vectorized(Pnl_req, Psto_cmax, Psto_dmax, Pgen_max,
+                         Pgen, Psto, Pspill, Pshed):
+    """Vectorized `dispatch` for arrays of net load requests `Pnl_req`,
+    written to the arrays `Pgen`, `Psto`, `Pspill` and `Pshed`.
+
+    Uses a branchless formulation with min/max clamps, which is only equivalent
+    to `dispatch` when the storage power limits satisfy Psto_cmax <= 0 <= Psto_dmax.
+    """
+    # Storage first: discharging (Psto > 0) for load excess, charging (Psto < 0) for VRE excess
+    np.clip(Pnl_req, Psto_cmax, Psto_dmax, out=Psto)
+    # Residual load (when > 0) fed by the generator, up to its rating
+    Presid = np.subtract(Pnl_req, Psto, out=Pshed)
+    np.clip(Presid, 0.0, Pgen_max, out=Pgen)
+    # Load which cannot be fed is shed
+    Presid -= Pgen
+    np.maximum(Presid, 0.0, out=Pshed)
+    # VRE excess which cannot be stored is spilled
+    np.subtract(Psto, Pnl_req, out=Pspill)
+    np.maximum(Pspill, 0.0, out=Pspill)
+
+
+def _sim_operation_vectorized(Pnl_request, Psto_pmax, Psto_pmin, Esto_max, Esto_min,
+                              sto_loss, Esto_ini, Pgen_rated, dt,
+                              Pgen_traj, Psto_traj, Esto_traj, Pspill_traj, Pshed_traj):
+    """Vectorized variant of `_sim_operation_kernel` (same parameters and returns),
+    valid only when the storage energy limits never bind,
+    e.g. with no storage or a largely oversized one.
+
+    Storage power is first computed with its power limits only. If the resulting
+    energy trajectory stays within the energy limits, the computation is exact.
+    Otherwise, it returns None (leaving the trajectories partially written).
+    """
+    if not Psto_pmin <= 0.0 <= Psto_pmax:
+        return None # (assumption of `_dispatch_vectorized`)
+    # Dispatch, with storage power limited only by the rated charge/discharge powers
+    _dispatch_vectorized(Pnl_request, Psto_pmin, Psto_pmax, Pgen_rated,
+                         Pgen_traj, Psto_traj, Pspill_traj, Pshed_traj)
+    # Storage dynamics: Esto[k+1] = Esto[k] - (Psto + sto_loss*abs(Psto))*dt
+    Psto = Psto_traj
+    dEsto = np.abs(Psto)
+    dEsto *= sto_loss
+    dEsto += Psto
+    dEsto *= -dt
+    Esto_traj[0] = Esto_ini
+    Esto_traj[1:] = dEsto
+    Esto = np.cumsum(Esto_traj, out=Esto_traj)
+    if np.min(Esto) < Esto_min or np.max(Esto) > Esto_max:
+        return None # energy limits are binding: fallback to the time step loop
+
+    shed_duration_max = _max_run_duration(Pshed_traj > 0.0, dt)
+    return shed_duration_max, float(Esto[-1])
+
+
+def _sim_inputs(mg: Microgrid) -> tuple[np.ndarray, np.ndarray, np.ndarray, tuple[float, ...]]:
+    """Inputs of the simulation kernels for Microgrid `mg`
+
+    Returns: load, renewable potential and net load request arrays
+    (contiguous float64), and the tuple of scalar parameters
+    (Psto_pmax, Psto_pmin, Esto_max, Esto_min, sto_loss, Esto_ini, Pgen_rated, dt).
+    """
+    # Renewable power generation
+    # (remark on naming convention: all non-dispatchable sources are assumed renewable!)
+    # (arrays normalized as contiguous float64, as expected by simulation kernels)
+    renew_potential = np.ascontiguousarray(mg.renewable_potential(), dtype=np.float64)
+
+    # Desired load and net load
+    load = np.ascontiguousarray(mg.load, dtype=np.float64)
+    Pnl_request = load - renew_potential
+
+    # Fixed parameters
+    sto = mg.storage
+    Psto_pmax =  sto.power_discharge_max
+    Psto_pmin = -sto.power_charge_max # <0 in line with the generator convention for Psto
+    Esto_max = sto.energy_rated
+    Esto_min = sto.energy_min
+    # Initial storage state
+    Esto_ini = sto.energy_ini
+
+    params = (float(Psto_pmax), float(Psto_pmin), float(Esto_max), float(Esto_min),
+        float(sto.loss_factor), float(Esto_ini), float(mg.generator.power_rated),
+        float(mg.project.timestep))
+    return load, renew_potential, Pnl_request, params
+
+
+def _operation_stats(mg: Microgrid, load: np.ndarray, renew_potential: np.ndarray,
+                     traj: TrajRecorder, shed_duration_max: float, Esto: float
+                    ) -> OperationStats:
+    """Aggregate operation statistics of Microgrid `mg` from its simulated
+    trajectories `traj` (vectorized reductions), given the maximum duration
+    of load shedding and the final storage energy `Esto`"""
+    dt = mg.project.timestep
+    gen = mg.generator
+    Esto_ini = mg.storage.energy_ini
+    Pgen, Psto, Pspill, Pshed = traj.Pgen, traj.Psto, traj.Pspill, traj.Pshed
+    op_st = OperationStats()
+
+    # Load statistics
+    op_st.shed_energy = float(np.sum(Pshed))*dt
+    op_st.shed_max = float(np.max(Pshed, initial=0.0))
+    op_st.shed_hours = float(np.count_nonzero(Pshed > 0.0))*dt
+    op_st.shed_duration_max = float(shed_duration_max)
+
+    # Dispatchable generator statistics (Pgen = 0 when generator is OFF)
+    op_st.gen_energy = float(np.sum(Pgen))*dt
+    op_st.gen_hours = float(np.count_nonzero(Pgen > 0.0))*dt
+    # fuel rate when ON: fuel_intercept*power_rated + fuel_slope*Pgen (L/h)
+    op_st.gen_fuel = gen.fuel_intercept * gen.power_rated * op_st.gen_hours + \
+                     gen.fuel_slope * op_st.gen_energy
+
+    # Energy storage (e.g. battery) statistics
+    op_st.storage_dis_energy =  float(np.sum(np.maximum(Psto, 0.0)))*dt
+    op_st.storage_char_energy = float(np.sum(np.maximum(-Psto, 0.0)))*dt
+
+    # Non-dispatchable (typ. renewables) sources statistics
+    op_st.spilled_energy = float(np.sum(Pspill))*dt
+    op_st.spilled_max = float(np.max(Pspill, initial=0.0))
 
     # Some more aggregated operation statistics
-    load_energy = np.sum(mg.load)*dt
+    load_energy = float(np.sum(load))*dt
     op_st.served_energy = load_energy - op_st.shed_energy
     op_st.shed_rate = op_st.shed_energy / load_energy \
         if load_energy != 0.0 else np.nan
 
     op_st.storage_loss_energy = op_st.storage_char_energy \
-        - op_st.storage_dis_energy - (Esto - Esto_ini)
+        - op_st.storage_dis_energy - (float(Esto) - Esto_ini)
     storage_throughput = op_st.storage_char_energy + op_st.storage_dis_energy
     op_st.storage_cycles = storage_throughput / (2*mg.storage.energy_rated) \
         if mg.storage.energy_rated != 0.0 else np.nan
 
-    op_st.renew_potential_energy = np.sum(renew_potential)
+    op_st.renew_potential_energy = float(np.sum(renew_potential))
     op_st.renew_energy = op_st.renew_potential_energy - op_st.spilled_energy
     op_st.renew_rate = 1 - op_st.gen_energy/op_st.served_energy \
         if op_st.served_energy != 0.0 else np.nan
     op_st.spilled_rate = op_st.spilled_energy / op_st.renew_potential_energy \
         if op_st.renew_potential_energy != 0.0 else np.inf
     return op_st
+
+
+def sim_operation(mg: Microgrid, recorder: TrajRecorder | None = None) -> OperationStats:
+    """Simulate the operation of Microgrid project `mg`.
+
+    Operation time series are optionnaly recorded if `recorder` is a `TrajRecorder` instance.
+
+    Returns operational statistics.
+    """
+    load, renew_potential, Pnl_request, params = _sim_inputs(mg)
+    K = len(load)
+
+    # Trajectories of operational variables
+    if recorder:
+        recorder.init(K)
+        recorder.Prep[:] = renew_potential
+        traj = recorder
+    else: # (trajectories computed anyway, but discarded)
+        traj = TrajRecorder.allocate(K)
+
+    ### Operation simulation
+    sim_args = (Pnl_request, *params,
+        traj.Pgen, traj.Psto, traj.Esto, traj.Pspill, traj.Pshed)
+    # Fast path, valid if storage energy limits never bind.
+    # Only used without Numba: the compiled loop is faster, even without storage.
+    sim_result = None
+    if not HAS_NUMBA:
+        sim_result = _sim_operation_vectorized(*sim_args)
+    if sim_result is None:
+        # General case: time step loop (compiled kernel)
+        sim_result = _sim_operation_kernel(*sim_args)
+    shed_duration_max, Esto = sim_result
+
+    return _operation_stats(mg, load, renew_potential, traj, shed_duration_max, Esto)
+
+
+@njit(parallel=True, cache=True)
+def _sim_operation_batch_kernel(Pnl_request, params,
+                                Pgen_traj, Psto_traj, Esto_traj, Pspill_traj, Pshed_traj):
+    """`_sim_operation_kernel` applied to S independent scenarios
+    (in parallel, with Numba)
+
+    Arrays have one row per scenario: net load request `Pnl_request`
+    and trajectories (S,K) (`Esto_traj`: (S,K+1)), scalar parameters `params` (S,8).
+
+    Returns the maximum durations of load shedding and final storage energies (S,2).
+    """
+    S = Pnl_request.shape[0]
+    results = np.empty((S, 2))
+    for s in prange(S):
+        p = params[s]
+        shed_duration_max, Esto = _sim_operation_kernel(Pnl_request[s],
+            p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7],
+            Pgen_traj[s], Psto_traj[s], Esto_traj[s], Pspill_traj[s], Pshed_traj[s])
+        results[s, 0] = shed_duration_max
+        results[s, 1] = Esto
+    return results
+
+
+def sim_operation_batch(microgrids: Sequence[Microgrid]) -> list[OperationStats]:
+    """Simulate the operation of several Microgrid projects, e.g. for a sizing sweep.
+
+    All `microgrids` should have time series of the same length K.
+    With Numba, simulations run in parallel on all CPU cores.
+    Memory use is about 5 arrays of K floats for each microgrid.
+
+    Returns the operational statistics of each microgrid (as `sim_operation`).
+    """
+    if len(microgrids) == 0:
+        return []
+    inputs = [_sim_inputs(mg) for mg in microgrids]
+    Pnl_request = np.stack([Pnl_req for _, _, Pnl_req, _ in inputs])
+    params = np.array([p for _, _, _, p in inputs])
+    S, K = Pnl_request.shape
+
+    Pgen = np.zeros((S, K))
+    Psto = np.zeros((S, K))
+    Esto = np.zeros((S, K+1))
+    Pspill = np.zeros((S, K))
+    Pshed = np.zeros((S, K))
+    results = _sim_operation_batch_kernel(Pnl_request, params,
+                                          Pgen, Psto, Esto, Pspill, Pshed)
+
+    stats = []
+    for s, (mg, (load, renew_potential, _, _)) in enumerate(zip(microgrids, inputs)):
+        traj = TrajRecorder(renew_potential, Pgen[s], Psto[s], Esto[s], Pspill[s], Pshed[s])
+        stats.append(_operation_stats(mg, load, renew_potential, traj,
+                                      float(results[s, 0]), float(results[s, 1])))
+    return stats
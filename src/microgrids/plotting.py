@@ -4,6 +4,7 @@
 # Distributed under the terms of the MIT License.
 # The full license is in the file LICENSE.txt, distributed with this software.
 
+import math
 import numpy as np
 import numpy.typing as npt
 from typing import Any, Union
@@ -14,6 +15,7 @@ from matplotlib.axes import Axes
 from matplotlib.patches import FancyBboxPatch, Circle, Arrow
 
 
+from ._jit import njit
 from .components import Microgrid
 from .operation import OperationStats, TrajRecorder
 
@@ -22,6 +24,19 @@ AxesOpt = Union[Axes, None]
 
 __all__ = ['plot_ratings', 'plot_oper_traj', 'plot_energy_mix']
 
+# time vectors (in days) of `plot_oper_traj`, keyed by (length, timestep in h)
+_td_cache: dict[tuple[int, float], np.ndarray] = {}
+
+def _time_days(n:int, timestep:float) -> np.ndarray:
+    """read-only time vector in days, for `n` instants of `timestep` hours"""
+    key = (n, timestep)
+    td = _td_cache.get(key)
+    if td is None:
+        td = np.arange(n) * (timestep/24)
+        td.flags.writeable = False # shared between calls
+        _td_cache[key] = td
+    return td
+
 
 def _add_component(ax:Axes, xy_A, anchor:str, width:float, height:float,
                     label='', color='C0'):
@@ -76,7 +91,14 @@ def plot_ratings(microgrid:Microgrid, unit='MW',
     """Box and lines diagram of the `microgrid`, annotated with the ratings
 
     Ratings are shown in `unit` ('kW', 'MW', 'GW', 'TW').
+    Component boxes are sized relative to the load peak, which should be positive.
     """
+    # Size normalization constant:
+    P0 = microgrid.load_max # kW
+    if not P0 > 0.0:
+        raise ValueError(f"Microgrid load peak should be positive to size the "
+                         f"component boxes, but got {P0} kW instead")
+
     if ax is None:
         fig, ax = plt.subplots(1,1, figsize=(6,4))
         standalone = True
@@ -96,8 +118,11 @@ def plot_ratings(microgrid:Microgrid, unit='MW',
     else:
         raise ValueError(f"Ratings `unit` should be 'kW', 'MW', 'GW' or 'TW', but got {unit} instead")
 
-    # Size normalization constant:
-    P0 = np.max(microgrid.load) # kW
+    def box_size(P):
+        """(width, height) of component box for rating `P`:
+        area proportional to the rating, relative to the max load"""
+        width = math.sqrt(P/P0)
+        return width, width*2/3
 
     ax.set(
         title='Microgrid ratings',
@@ -114,27 +139,23 @@ def plot_ratings(microgrid:Microgrid, unit='MW',
 
     # Generator
     Pgen = microgrid.generator.power_rated
-    width = np.sqrt(Pgen/P0)
-    height = width*2/3
+    width, height = box_size(Pgen)
     label = f'Generator\n{Pgen*scaling:.3g} {unit}'
     _add_component(ax, (1,0.5), 'SW', width, height,
                    label=label, color='#ffa3a0')
 
     # Storage
     Esto = microgrid.storage.energy_rated
-    width = np.sqrt(Esto/P0)
-    height = width*2/3
+    width, height = box_size(Esto)
     label=f'Storage\n{Esto*scaling:.3g} {unit}h'
     _add_component(ax, (-1,-0.5), 'NE', width, height,
                    label, color='#acffc9')
 
     # Non dispatchables: sum of all rated powers
-    if microgrid.nondispatchables:
-        names = microgrid.nondispatchables.keys()
-        name_joined = '\n+ '.join(names)
-        Pnd_tot = sum(nd.power_rated for nd in microgrid.nondispatchables.values())
-        width = np.sqrt(Pnd_tot/P0)
-        height = width*2/3
+    if microgrid._nd_sources:
+        name_joined = '\n+ '.join(microgrid._nd_names)
+        Pnd_tot = sum(nd.power_rated for nd in microgrid._nd_sources)
+        width, height = box_size(Pnd_tot)
         label=f'{name_joined}\n{Pnd_tot*scaling:.3g} {unit}'
         _add_component(ax, (-1,0.5), 'SE', width, height,
                     label, color='#ffe3a0')
@@ -148,10 +169,115 @@ def plot_ratings(microgrid:Microgrid, unit='MW',
     return fig
 
 
+@njit(cache=True)
+def _lttb_indices(x, y, n_out):
+    """indices of the `n_out` points of series (`x`, `y`) selected by the
+    Largest-Triangle-Three-Buckets (LTTB) downsampling algorithm
+
+    First and last points are always kept. In between, the series is split
+    into `n_out`-2 buckets, and, in each bucket, the point forming the largest
+    triangle with the previously selected point and the average of the next
+    bucket is kept (preserves the visual shape of peaks).
+    All indices are returned if `n_out` >= len(x) (or `n_out` < 3).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[n_out-1] = n-1
+    bucket = (n-2)/(n_out-2) # bucket size (fractional)
+    a = 0 # previously selected point
+    for i in range(n_out-2):
+        # average of next bucket (or last point)
+        start = int((i+1)*bucket) + 1
+        end = min(int((i+2)*bucket) + 1, n)
+        x_avg = x[start:end].mean()
+        y_avg = y[start:end].mean()
+        # point of current bucket with largest triangle area
+        lo = int(i*bucket) + 1
+        hi = int((i+1)*bucket) + 1
+        area = np.abs((x[a]-x_avg)*(y[lo:hi]-y[a]) - (x[a]-x[lo:hi])*(y_avg-y[a]))
+        a = lo + np.argmax(area)
+        idx[i+1] = a
+    return idx
+
+
+def _active(P):
+    """`where` mask of `fill_between` for the instants where `P` is positive,
+    extended by one sample on each side, so that isolated instants still
+    get a (triangular) polygon, which begins and ends on the zero-width edges.
+    """
+    active = P > 0.0
+    mask = active.copy()
+    mask[1:] |= active[:-1]
+    mask[:-1] |= active[1:]
+    return mask
+
+
 def plot_oper_traj(microgrid:Microgrid, oper_traj:TrajRecorder,
-                   ax : AxesArrayOpt = None) -> Figure:
-    """plot trajectories of operational microgrid variables"""
-    td = np.arange(24*365)/24 # time in days
+                   ax : AxesArrayOpt = None,
+                   downsample: Union[int, None] = None,
+                   reuse_fig: Union[Figure, None] = None,
+                   rasterized: bool = False) -> Figure:
+    """plot trajectories of operational microgrid variables
+
+    If `downsample` is given, each series is reduced to at most this number
+    of points with the LTTB algorithm before plotting (e.g. 2000 points,
+    i.e. about the pixel width of the figure), for faster rendering
+    of long time series.
+
+    If `reuse_fig` is a Figure previously returned by `plot_oper_traj`,
+    its artists are updated in place with the new trajectories (`ax` is ignored),
+    which is much faster than creating a new figure in repeated calls
+    (animations, interactive parameter scans).
+
+    If `rasterized` is True, trajectory lines and fills are rasterized
+    when saving to vector formats (PDF, SVG), while axes and texts stay vectorial:
+    this gives much smaller files, faster to save and to display.
+    """
+    td = _time_days(len(microgrid.load), microgrid.project.timestep) # time in days
+
+    def ds(*series, ref=None):
+        """downsampled time and `series`, with points selected on series `ref`
+        (default: first series), so that series sharing `ref` stay aligned"""
+        if downsample is None:
+            return (td,) + series
+        if ref is None:
+            ref = series[0]
+        idx = _lttb_indices(td, np.asarray(ref), downsample)
+        return (td[idx],) + tuple(np.asarray(y)[idx] for y in series)
+
+    # Storage discharge and charge powers (positive and negative parts of Psto)
+    Psto_dis = np.maximum(oper_traj.Psto, 0.0)
+    Psto_char = np.maximum(-oper_traj.Psto, 0.0)
+    actual_load = microgrid.load - oper_traj.Pshed
+    actual_renew = oper_traj.Prep - oper_traj.Pspill
+
+    # Data of line artists: (t, y) and of fill artists: (t, y1, y2, where)
+    lines = {
+        'load req': ds(microgrid.load),
+        'load': ds(actual_load),
+        'gen': ds(oper_traj.Pgen),
+        'sto dis': ds(Psto_dis),
+        'renew pot': ds(oper_traj.Prep),
+        'renew': ds(actual_renew),
+        'sto char': ds(Psto_char),
+        'sto ener': ds(oper_traj.Esto[:-1]),
+    }
+    fills = {}
+    t, actual_load_ds, load_ds, Pshed_ds = ds(actual_load, microgrid.load,
+                                              oper_traj.Pshed, ref=oper_traj.Pshed)
+    fills['shed'] = (t, actual_load_ds, load_ds, _active(Pshed_ds))
+    t, actual_renew_ds, Prep_ds, Pspill_ds = ds(actual_renew, oper_traj.Prep,
+                                                oper_traj.Pspill, ref=oper_traj.Pspill)
+    fills['spill'] = (t, actual_renew_ds, Prep_ds, _active(Pspill_ds))
+    Esto_max = microgrid.storage.energy_rated
+    Esto_min = microgrid.storage.energy_min
+
+    artists = getattr(reuse_fig, '_mg_oper_traj', None)
+    if artists is not None:
+        return _update_oper_traj(reuse_fig, artists, lines, fills, Esto_min, Esto_max)
 
     if ax is None:
         fig, ax = plt.subplots(3, 1, sharex=True, figsize=(6,6))
@@ -170,29 +296,20 @@ def plot_oper_traj(microgrid:Microgrid, oper_traj:TrajRecorder,
         sto_dis='tab:green',
         sto_ener='tab:green',
     )
-
-    def pos(x):
-        """positive part"""
-        return x if x > 0.0 else 0.0
-
-    def neg(x):
-        """negative part"""
-        return -x if x < 0.0 else 0.0
-
-    pos = np.vectorize(pos)
-    neg = np.vectorize(neg)
+    artists = {}
 
     # Load, generator and battery discharge
-    ax[0].plot(td, microgrid.load, label='load req',
+    artists['load req'], = ax[0].plot(*lines['load req'], label='load req',
                color=c['load'], lw=1)
-    actual_load = microgrid.load - oper_traj.Pshed
-    ax[0].plot(td, actual_load, label='load',
+    artists['load'], = ax[0].plot(*lines['load'], label='load',
                color=c['load'], lw=5, alpha=0.5)
-    ax[0].fill_between(td, actual_load, microgrid.load, #where=oper_traj.Pshed>0.0,
+    t, y1, y2, where = fills['shed']
+    artists['shed'] = ax[0].fill_between(t, y1, y2, where=where,
+                    interpolate=False,
                     label='shed', lw=0, color=c['shed'], alpha=0.6)
-    ax[0].plot(td, oper_traj.Pgen, label='gen',
+    artists['gen'], = ax[0].plot(*lines['gen'], label='gen',
                color=c['gen'])
-    ax[0].plot(td, pos(oper_traj.Psto), label='sto dis',
+    artists['sto dis'], = ax[0].plot(*lines['sto dis'], label='sto dis',
                color=c['sto_dis'])
 
     ax[0].set(
@@ -201,14 +318,15 @@ def plot_oper_traj(microgrid:Microgrid, oper_traj:TrajRecorder,
     )
 
     # Renewable production and battery charging
-    actual_renew = oper_traj.Prep - oper_traj.Pspill
-    ax[1].plot(td, oper_traj.Prep, label='renew pot',
+    artists['renew pot'], = ax[1].plot(*lines['renew pot'], label='renew pot',
               lw=0.5, color=c['renew'])
-    ax[1].plot(td, actual_renew, label='renew',
+    artists['renew'], = ax[1].plot(*lines['renew'], label='renew',
                color=c['renew'])
-    ax[1].fill_between(td, actual_renew, oper_traj.Prep, #where=oper_traj.Pspill>0.0,
+    t, y1, y2, where = fills['spill']
+    artists['spill'] = ax[1].fill_between(t, y1, y2, where=where,
+                    interpolate=False,
                     label='spill', lw=0, color=c['spill'], alpha=0.3)
-    ax[1].plot(td, neg(oper_traj.Psto), label='sto char',
+    artists['sto char'], = ax[1].plot(*lines['sto char'], label='sto char',
                color=c['sto_ch'])
 
     ax[1].set(
@@ -217,19 +335,21 @@ def plot_oper_traj(microgrid:Microgrid, oper_traj:TrajRecorder,
     )
 
     # Energy storage state
-    ax[2].plot(td, oper_traj.Esto[:-1], label='sto ener',
+    artists['sto ener'], = ax[2].plot(*lines['sto ener'], label='sto ener',
               color=c['sto_ener'])
-    Esto_max = microgrid.storage.energy_rated
-    Esto_min = microgrid.storage.SoC_min * microgrid.storage.energy_rated
-    ax[2].axhline(Esto_min, label='min, max',
+    artists['sto min'] = ax[2].axhline(Esto_min, label='min, max',
                   color='k', ls='--')
-    ax[2].axhline(Esto_max,
+    artists['sto max'] = ax[2].axhline(Esto_max,
                   color='k', ls='--')
     ax[2].set(
         title = 'Energy storage state',
         ylabel = 'kWh'
     )
 
+    if rasterized:
+        for name in (*lines, *fills):
+            artists[name].set_rasterized(True)
+
     for axi in ax:
         axi.grid()
         axi.legend(loc='upper right', ncol=2)
@@ -237,6 +357,40 @@ def plot_oper_traj(microgrid:Microgrid, oper_traj:TrajRecorder,
     if standalone:
         fig.tight_layout()
 
+    # artists kept for in place updates (`reuse_fig`)
+    fig._mg_oper_traj = artists
+
+    return fig
+
+def _update_oper_traj(fig:Figure, artists:dict, lines:dict, fills:dict,
+                      Esto_min:float, Esto_max:float) -> Figure:
+    """update in place the artists of a figure created by `plot_oper_traj`"""
+    for name, (t, y) in lines.items():
+        artists[name].set_data(t, y)
+    for name, (t, y1, y2, where) in fills.items():
+        fill = artists[name]
+        if hasattr(fill, 'set_data'): # matplotlib >= 3.10
+            fill.set_data(t, y1, y2, where=where)
+        else: # re-create the fill, with the same properties and legend position
+            axf = fill.axes
+            handles, _ = axf.get_legend_handles_labels()
+            fill.remove()
+            new_fill = axf.fill_between(t, y1, y2, where=where,
+                interpolate=False, label=fill.get_label(), lw=0,
+                color=fill.get_facecolor()[0], alpha=fill.get_alpha(),
+                zorder=fill.get_zorder(), rasterized=fill.get_rasterized())
+            handles = [new_fill if h is fill else h for h in handles]
+            axf.legend(handles=handles, loc='upper right', ncol=2)
+            artists[name] = new_fill
+    artists['sto min'].set_ydata([Esto_min, Esto_min])
+    artists['sto max'].set_ydata([Esto_max, Esto_max])
+
+    axes = {artist.axes for artist in artists.values()}
+    for axi in axes:
+        axi.relim()
+        axi.autoscale_view()
+    fig.canvas.draw_idle()
+
     return fig
 
 def plot_energy_mix(microgrid:Microgrid, oper_stats:OperationStats, unit='MWh',
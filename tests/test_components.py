@@ -4,6 +4,7 @@ import microgrids as mgs
 import numpy as np
 from pytest import approx
 
+
 def test_wind_capacity_factor():
     # Wind turbine parameters fitted to an EWT 900 kW DW52
     S_D52 = np.pi * (52/2)**2 # rotor swept area m²
@@ -15,4 +16,95 @@ def test_wind_capacity_factor():
     cf_exp =     np.array([0., 0., 0.005, 0.075, 0.227, 0.630, 0.997, 1.0, 0.])
 
     cf = mgs.WindPower.capacity_from_wind(wind_speed, TSP_D52, Cp_D52, v_out, α_D52)
-    assert(cf == approx(cf_exp, abs=1e-3))
\ No newline at end of file
+    assert(cf == approx(cf_exp, abs=1e-3))
+
+    # list input (including integers) and scalar input
+    cf_list = mgs.WindPower.capacity_from_wind([0, 2, 3, 5, 7, 10, 15, 25, 25.1],
+                                               TSP_D52, Cp_D52, v_out, α_D52)
+    assert(cf_list == approx(cf, rel=1e-12))
+    cf_scalar = mgs.WindPower.capacity_from_wind(10, TSP_D52, Cp_D52, v_out, α_D52)
+    assert(cf_scalar == approx(cf[5], rel=1e-12))
+    # float32 is kept, float16 is converted to float64
+    cf32 = mgs.WindPower.capacity_from_wind(wind_speed.astype(np.float32),
+                                            TSP_D52, Cp_D52, v_out, α_D52)
+    assert cf32.dtype == np.float32
+    assert(cf32 == approx(cf, abs=1e-6))
+    cf16 = mgs.WindPower.capacity_from_wind(wind_speed.astype(np.float16),
+                                            TSP_D52, Cp_D52, v_out, α_D52)
+    assert cf16.dtype == np.float64
+    assert(cf16 == approx(cf, abs=1e-3))
+
+
+def test_duck_typed_source():
+    """any object with a `production` method is a non-dispatchable source"""
+    class ConstantSource:
+        def production(self):
+            return np.full(3, 2.0)
+
+    project = mgs.Project(25, 0.05, 1.)
+    generator = mgs.DispatchableGenerator(1., 0., 0.24, 1., 400., 0.02, 15000.)
+    battery = mgs.Battery(1., 350., 10., 15., 3000.)
+    pv = mgs.Photovoltaic(3., np.array([0., 0.5, 1.]), 1200., 20., 25., 1.0)
+    mg = mgs.Microgrid(project, np.ones(3), generator, battery,
+                       {'Solar PV': pv, 'Constant': ConstantSource()})
+    assert mg.renewable_potential() == approx([2., 3.5, 5.])
+    assert mg.renewable_productions == approx(np.array([pv.production(), [2., 2., 2.]]))
+    # only `production` is needed to simulate the operation
+    oper_stats = mgs.sim_operation(mg)
+    assert oper_stats.renew_potential_energy == approx(10.5)
+
+
+def test_battery_derived_values():
+    """derived power and energy limits, also after `dataclasses.replace`"""
+    from dataclasses import replace
+    battery = mgs.Battery(100., 350., 10., 15., 3000.,
+                          charge_rate=0.5, discharge_rate=2.0, SoC_min=0.2, SoC_ini=0.6)
+    assert battery.energy_min == approx(20.)
+    assert battery.energy_ini == approx(60.)
+    assert battery.power_charge_max == approx(50.)
+    assert battery.power_discharge_max == approx(200.)
+    battery = replace(battery, energy_rated=10.)
+    assert battery.energy_min == approx(2.)
+    assert battery.power_discharge_max == approx(20.)
+
+
+def test_time_series_copied():
+    """in place changes of input arrays don't affect components"""
+    irradiance = np.array([0., 0.5, 1.])
+    load = np.ones(3)
+    pv = mgs.Photovoltaic(3., irradiance, 1200., 20., 25., 1.0)
+    project = mgs.Project(25, 0.05, 1.)
+    generator = mgs.DispatchableGenerator(1., 0., 0.24, 1., 400., 0.02, 15000.)
+    battery = mgs.Battery(1., 350., 10., 15., 3000.)
+    mg = mgs.Microgrid(project, load, generator, battery, {'Solar PV': pv})
+    irradiance *= 2
+    load *= 2
+    assert pv.production() == approx([0., 1.5, 3.])
+    assert mg.renewable_potential() == approx([0., 1.5, 3.])
+    assert mg.load_max == mg.load.max() == 1.
+    assert not pv.irradiance.flags.writeable
+
+    # empty time series are accepted
+    mg = mgs.Microgrid(project, [], generator, battery, {})
+    assert mg.load_max == 0.
+
+
+def test_nondispatchables_read_only():
+    """sources can't be added after creation (their productions are precomputed)"""
+    import pickle
+    from pytest import raises
+    project = mgs.Project(25, 0.05, 1.)
+    generator = mgs.DispatchableGenerator(1., 0., 0.24, 1., 400., 0.02, 15000.)
+    battery = mgs.Battery(1., 350., 10., 15., 3000.)
+    pv = mgs.Photovoltaic(3., np.array([0., 0.5, 1.]), 1200., 20., 25., 1.0)
+    sources = {}
+    mg = mgs.Microgrid(project, np.ones(3), generator, battery, sources)
+    with raises(TypeError):
+        mg.nondispatchables['Solar PV'] = pv
+    sources['Solar PV'] = pv # (caller's dict is copied)
+    assert len(mg.nondispatchables) == 0
+    # pickling
+    mg = mgs.Microgrid(project, np.ones(3), generator, battery, {'Solar PV': pv})
+    mg2 = pickle.loads(pickle.dumps(mg))
+    assert list(mg2.nondispatchables) == ['Solar PV']
+    assert mg2.renewable_potential() == approx(mg.renewable_potential())
@@ -0,0 +1,48 @@
+# Tests for economics
+
+import numpy as np
+from pytest import approx
+
+import microgrids as mgs
+from microgrids.economics import CostFactors, EconomicsEngine, _sum_discounts, _sum_replacement_factors
+
+
+def test_discount_sums():
+    """closed forms of discount factors sums match explicit sums"""
+    for r in [0.0, 0.05, 0.12]:
+        L = 25
+        sum_explicit = sum(1/(1 + r)**i for i in range(1, L+1))
+        assert _sum_discounts(L, r) == approx(sum_explicit, rel=1e-12)
+
+        lifetime, n = 7.5, 3 # replacements at 7.5, 15 and 22.5 years
+        sum_explicit = sum(1/(1 + r)**(i*lifetime) for i in range(1, n+1))
+        assert _sum_replacement_factors(lifetime, n, r) == approx(sum_explicit, rel=1e-12)
+
+
+def test_engine_cost_factors():
+    """component costs without discounting (r=0)"""
+    engine = EconomicsEngine(mgs.Project(25, 0.0, 1.))
+    # 1000 units of 15 years lifetime: 1 replacement, 5/15 of life left at the end
+    c = engine.cost_factors(1000., 15., 400., 400., 400., 20.)
+    assert c.investment == approx(400e3)
+    assert c.replacement == approx(400e3)
+    assert c.om == approx(20*1000*25)
+    assert c.salvage == approx(-400e3/3)
+    assert c.total == approx(400e3 + 400e3 + 500e3 - 400e3/3)
+    # infinite lifetime: no replacement, sold "as new"
+    c = engine.cost_factors(1000., np.inf, 400., 400., 400., 20.)
+    assert c.replacement == 0.0
+    assert c.salvage == approx(-400e3)
+
+
+def test_from_prices_batch():
+    """vectorized cost factors match `from_prices` component by component"""
+    for r in [0.0, 0.05]:
+        project = mgs.Project(25, r, 1.)
+        lifetimes = np.array([15., 25., 7.5, np.inf])
+        costs = CostFactors.from_prices_batch(project, 1000., lifetimes,
+            400., 300., 200., 20., [0., 0., 10., 0.], 1.)
+        for lifetime, fuel, c in zip(lifetimes, [0., 0., 10., 0.], costs):
+            c_ref = CostFactors.from_prices(project, 1000., lifetime,
+                400., 300., 200., 20., fuel, 1.)
+            assert c == approx(c_ref.to_array(), rel=1e-12)
@@ -0,0 +1,25 @@
+# Tests for the optional JIT compilation
+
+import subprocess
+import sys
+
+
+def test_lazy_numba_import():
+    """importing microgrids doesn't import Numba (only kernel calls do)"""
+    code = "import sys, microgrids; print('numba' in sys.modules)"
+    out = subprocess.run([sys.executable, '-c', code],
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == 'False'
+
+
+
+def test_numba_disable_jit():
+    """with NUMBA_DISABLE_JIT=1, Numba is not used (NumPy kernels instead)"""
+    import os
+    code = ("import sys, microgrids; "
+            "microgrids.WindPower.capacity_from_wind([5., 10.], 300.); "
+            "print(microgrids._jit.HAS_NUMBA, 'numba' in sys.modules)")
+    env = dict(os.environ, NUMBA_DISABLE_JIT='1')
+    out = subprocess.run([sys.executable, '-c', code], env=env,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == 'False False'
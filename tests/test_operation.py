@@ -0,0 +1,203 @@
+# Tests for operation
+
+import numpy as np
+from pytest import approx
+
+from microgrids.operation import dispatch
+
+
+def dispatch_ref(Pnl_req, Psto_cmax, Psto_dmax, Pgen_max):
+    """reference (if/else) implementation of the load following dispatch"""
+    Pspill = 0.0
+    Pshed = 0.0
+    if Pnl_req >= 0.0:
+        if Pnl_req >= Psto_dmax:
+            Psto = Psto_dmax
+            if Pnl_req - Psto >= Pgen_max:
+                Pgen  = Pgen_max
+                Pshed = Pnl_req - Psto - Pgen
+            else:
+                Pgen = Pnl_req - Psto
+        else:
+            Pgen  = 0.0
+            Psto = Pnl_req
+    else:
+        Pgen  = 0.0
+        if Pnl_req >= Psto_cmax:
+            Psto = Pnl_req
+        else:
+            Psto = Psto_cmax
+            Pspill  = Psto - Pnl_req
+    return Pgen, Psto, Pspill, Pshed
+
+
+def test_dispatch():
+    """dispatch (and its vectorized variant) match the reference implementation"""
+    from microgrids.operation import _dispatch_vectorized
+    rng = np.random.default_rng(0)
+    n = 1000
+    Pnl_req = rng.uniform(-3., 3., n)
+    Psto_cmax, Psto_dmax, Pgen_max = -rng.uniform(0, 1), *rng.uniform(0, 1, 2)
+    for Psto_cmax, Psto_dmax in [(Psto_cmax, Psto_dmax), (0.0, 0.0)]: # incl. zero ratings
+        traj_vec = [np.zeros(n) for i in range(4)]
+        _dispatch_vectorized(Pnl_req, Psto_cmax, Psto_dmax, Pgen_max, *traj_vec)
+        for k in range(n):
+            args = (Pnl_req[k], Psto_cmax, Psto_dmax, Pgen_max)
+            res_ref = dispatch_ref(*args)
+            assert dispatch(*args) == approx(res_ref, abs=1e-12)
+            assert [x[k] for x in traj_vec] == approx(res_ref, abs=1e-12)
+
+    # storage below its minimum energy: negative discharge limit
+    args = (-0.1, -1.0, -0.5, 1.0)
+    assert dispatch(*args) == approx(dispatch_ref(*args), abs=1e-12)
+
+
+def test_sim_operation_vectorized():
+    """vectorized simulation matches the time step loop when storage energy limits don't bind"""
+    from microgrids.operation import _sim_operation_kernel, _sim_operation_vectorized
+    rng = np.random.default_rng(0)
+    K = 100
+    Pnl_request = rng.uniform(-1., 2., K)
+    Pnl_request[40:45] = 3. # load shedding event
+    for Esto_max, Psto_max, binding in [(0., 0., False), (1000., 0.5, False), (2., 0.5, True)]:
+        params = (Pnl_request, Psto_max, -Psto_max, Esto_max, 0., 0.05, Esto_max/2, 1.5, 1.)
+        traj_loop = [np.zeros(K), np.zeros(K), np.zeros(K+1), np.zeros(K), np.zeros(K)]
+        traj_vec = [np.zeros(K), np.zeros(K), np.zeros(K+1), np.zeros(K), np.zeros(K)]
+        res_loop = _sim_operation_kernel(*params, *traj_loop)
+        res_vec = _sim_operation_vectorized(*params, *traj_vec)
+        if binding:
+            assert res_vec is None
+        else:
+            assert res_vec == approx(res_loop)
+            for x_vec, x_loop in zip(traj_vec, traj_loop):
+                assert x_vec == approx(x_loop)
+
+
+def test_sim_operation_below_min_energy():
+    """simulation with an initial storage energy below its minimum (SoC_ini < SoC_min)"""
+    import microgrids as mgs
+    from microgrids.operation import _sim_operation_vectorized
+    K = 20
+    load = np.full(K, 1.0)
+    irradiance = np.repeat([1.2, 0.], K//2) # net load: -0.2 kW, then 1 kW
+    project = mgs.Project(25, 0.05, 1.)
+    generator = mgs.DispatchableGenerator(2., 0., 0.24, 1., 400., 0.02, 15000.)
+    battery = mgs.Battery(10., 350., 10., 15., 3000., SoC_min=0.5, SoC_ini=0.1)
+    pv = mgs.Photovoltaic(1., irradiance, 1200., 20., 25., 1.0)
+    mg = mgs.Microgrid(project, load, generator, battery, {'Solar PV': pv})
+    traj = mgs.TrajRecorder()
+    mgs.sim_operation(mg, traj)
+
+    # Reference time step loop, with the reference dispatch
+    Pnl_request = load - pv.production()
+    Esto = battery.energy_ini
+    loss = battery.loss_factor
+    for k in range(K):
+        assert traj.Esto[k] == approx(Esto)
+        Psto_dmax = min((Esto - battery.energy_min)/(1 + loss), battery.power_discharge_max)
+        Psto_cmax = max(-(battery.energy_rated - Esto)/(1 - loss), -battery.power_charge_max)
+        Pgen, Psto, Pspill, Pshed = dispatch_ref(Pnl_request[k], Psto_cmax, Psto_dmax, 2.)
+        assert (traj.Pgen[k], traj.Psto[k], traj.Pspill[k], traj.Pshed[k]) == \
+               approx((Pgen, Psto, Pspill, Pshed), abs=1e-12)
+        Esto = Esto - (Psto + loss*abs(Psto))
+    # (not handled by the vectorized fast path)
+    traj_vec = [np.zeros(K), np.zeros(K), np.zeros(K+1), np.zeros(K), np.zeros(K)]
+    params = (Pnl_request, 10., -10., 10., 5., loss, 1., 2., 1.)
+    assert _sim_operation_vectorized(params[0].astype(float), *params[1:], *traj_vec) is None
+
+
+def test_sim_operation_batch():
+    """batch simulation matches individual simulations"""
+    import microgrids as mgs
+    rng = np.random.default_rng(0)
+    K = 100
+    load = rng.uniform(0.5, 1.5, K)
+    irradiance = rng.uniform(0., 1., K)
+    project = mgs.Project(25, 0.05, 1.)
+    generator = mgs.DispatchableGenerator(1., 0., 0.24, 1., 400., 0.02, 15000.)
+    microgrids = []
+    for energy_rated, power_rated_pv in [(0., 0.), (2., 1.), (5., 3.)]:
+        battery = mgs.Battery(energy_rated, 350., 10., 15., 3000.)
+        pv = mgs.Photovoltaic(power_rated_pv, irradiance, 1200., 20., 25.)
+        microgrids.append(mgs.Microgrid(project, load, generator, battery, {'Solar PV': pv}))
+
+    stats_batch = mgs.sim_operation_batch(microgrids)
+    for mg, stats in zip(microgrids, stats_batch):
+        stats_ref = mgs.sim_operation(mg)
+        for name in stats.__slots__:
+            assert getattr(stats, name) == approx(getattr(stats_ref, name), nan_ok=True)
+
+
+def ouessant_microgrid(energy_rated):
+    """Microgrid with PV, wind and storage over two weeks of Ouessant data (June 2016)"""
+    import microgrids as mgs
+    from pathlib import Path
+    datapath = Path(__file__).parents[1] / 'examples' / 'data' / 'Ouessant_data_2016.csv'
+    data = np.loadtxt(datapath, delimiter=',', skiprows=2+4000, max_rows=336,
+                      usecols=(1,2,4))
+    load, irradiance, wind_speed = data[:,0], data[:,1]/1000, data[:,2]
+    project = mgs.Project(25, 0.05, 1.)
+    generator = mgs.DispatchableGenerator(400., 0.05, 0.240, 1., 400., 0.02, 15000.)
+    battery = mgs.Battery(energy_rated, 350., 10., 15., 3000., 1., 1., 0.05)
+    pv = mgs.Photovoltaic(2000., irradiance, 1200., 20., 25.)
+    cf = mgs.WindPower.capacity_from_wind(wind_speed, TSP=300., v_out=25.)
+    wind = mgs.WindPower(900., cf, 3500., 100., 25.)
+    return mgs.Microgrid(project, load, generator, battery, {'Solar PV': pv, 'Wind': wind})
+
+
+def test_sim_regression():
+    """operation and economics results match reference values (computed with microgrids 0.3.1)"""
+    import microgrids as mgs
+    nan = np.nan
+    cases = [
+        (3000.0, dict(
+            served_energy=158901.106308, shed_energy=1753.89369239,
+            shed_max=285.685128535, shed_hours=16, shed_duration_max=4,
+            shed_rate=0.0109171435211, gen_energy=22592.4353828, gen_hours=95,
+            gen_fuel=7322.18449188, storage_cycles=9.8744581482,
+            storage_char_energy=32604.5431668, storage_dis_energy=26642.2057224,
+            storage_loss_energy=2962.33744446, spilled_energy=34746.9107632,
+            spilled_max=1425.81581957, spilled_rate=0.19629035825,
+            renew_potential_energy=177017.919132, renew_energy=142271.008369,
+            renew_rate=0.857820779806,
+            ), 9490885.53375, 4.23786634475),
+        (0.0, dict(
+            served_energy=154817.264043, shed_energy=5837.73595688,
+            shed_max=341.897905723, shed_hours=45, shed_duration_max=7,
+            shed_rate=0.0363370947489, gen_energy=45150.7988407, gen_hours=186,
+            gen_fuel=14556.1917218, storage_cycles=nan, storage_char_energy=0,
+            storage_dis_energy=0, storage_loss_energy=0, spilled_energy=67351.4539301,
+            spilled_max=1684.85939277, spilled_rate=0.380478170008,
+            renew_potential_energy=177017.919132, renew_energy=109666.465202,
+            renew_rate=0.708360697886,
+            ), 7735737.31632, 3.54527368125),
+    ]
+    for energy_rated, stats_exp, npc_exp, lcoe_exp in cases:
+        mg = ouessant_microgrid(energy_rated)
+        stats = mgs.sim_operation(mg)
+        for name, value in stats_exp.items():
+            assert getattr(stats, name) == approx(value, rel=1e-9, nan_ok=True), name
+        assert all(type(getattr(stats, name)) is float for name in stats_exp)
+        assert not np.signbit(stats.storage_char_energy)
+        assert not np.signbit(stats.storage_loss_energy)
+        mg_costs = mgs.sim_economics(mg, stats)
+        assert mg_costs.npc == approx(npc_exp, rel=1e-9)
+        assert mg_costs.lcoe == approx(lcoe_exp, rel=1e-9)
+
+
+def test_simulate():
+    """`Microgrid.simulate` and `simulate` chain operation and economics"""
+    import microgrids as mgs
+    mg = ouessant_microgrid(3000.)
+    stats_ref = mgs.sim_operation(mg)
+    mg_costs_ref = mgs.sim_economics(mg, stats_ref)
+    traj_ref = mgs.TrajRecorder()
+    mgs.sim_operation(mg, traj_ref)
+    for simulate in [mg.simulate, lambda rec: mgs.simulate(mg, rec)]:
+        traj = mgs.TrajRecorder()
+        stats, mg_costs = simulate(traj)
+        assert stats == stats_ref
+        assert (mg_costs.npc, mg_costs.lcoe) == (mg_costs_ref.npc, mg_costs_ref.lcoe)
+        assert traj.Esto == approx(traj_ref.Esto)
+        stats, mg_costs = simulate(None)
+        assert stats == stats_ref
@@ -0,0 +1,124 @@
+# Tests for plotting
+
+import numpy as np
+from pytest import approx, fixture, raises
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.collections
+
+import microgrids as mgs
+
+
+@fixture
+def oper_traj():
+    """small Microgrid with load shedding and spillage, and its trajectories"""
+    rng = np.random.default_rng(0)
+    K = 100
+    load = rng.uniform(0.5, 1.5, K)
+    irradiance = rng.uniform(0., 1., K)
+    project = mgs.Project(25, 0.05, 1.)
+    generator = mgs.DispatchableGenerator(0.8, 0., 0.24, 1., 400., 0.02, 15000.)
+    battery = mgs.Battery(1., 350., 10., 15., 3000.)
+    pv = mgs.Photovoltaic(2., irradiance, 1200., 20., 25.)
+    mg = mgs.Microgrid(project, load, generator, battery, {'Solar PV': pv})
+    traj = mgs.TrajRecorder()
+    mgs.sim_operation(mg, traj)
+    yield mg, traj
+    plt.close('all')
+
+
+def check_reuse_fig(mg, traj, **kwargs):
+    """second call with `reuse_fig` updates the same figure and artists"""
+    fig = mgs.plotting.plot_oper_traj(mg, traj, rasterized=True, **kwargs)
+    artists = dict(fig._mg_oper_traj)
+
+    traj2 = mgs.TrajRecorder()
+    mgs.sim_operation(mg, traj2)
+    traj2.Pgen *= 0.5 # (modified trajectory)
+    fig2 = mgs.plotting.plot_oper_traj(mg, traj2, reuse_fig=fig, **kwargs)
+    assert fig2 is fig
+    assert len(fig.axes) == 3
+    for name, artist in fig._mg_oper_traj.items():
+        assert artist.axes is not None # (still in the figure)
+        if name not in ('shed', 'spill'):
+            assert artist is artists[name]
+    # updated data
+    t, Pgen = fig._mg_oper_traj['gen'].get_data()
+    k = np.rint(t*24).astype(int) # (time in days, possibly downsampled)
+    assert Pgen == approx(traj2.Pgen[k])
+    # fills keep their properties and their legend entry
+    for name in ('shed', 'spill'):
+        fill = fig._mg_oper_traj[name]
+        assert fill.get_rasterized()
+        assert fill.get_label() == name
+        assert name in [text.get_text() for text in fill.axes.get_legend().get_texts()]
+    fig.canvas.draw()
+
+
+def test_reuse_fig(oper_traj):
+    mg, traj = oper_traj
+    check_reuse_fig(mg, traj)
+    check_reuse_fig(mg, traj, downsample=30)
+
+
+def test_reuse_fig_recreated_fills(oper_traj, monkeypatch):
+    """reuse_fig with matplotlib < 3.10 (fills without `set_data`)"""
+    # (with matplotlib >= 3.10, emulate older versions)
+    fill_class = getattr(matplotlib.collections, 'FillBetweenPolyCollection', None)
+    if fill_class is not None:
+        monkeypatch.delattr(fill_class, 'set_data')
+    mg, traj = oper_traj
+    check_reuse_fig(mg, traj)
+    check_reuse_fig(mg, traj, downsample=30)
+
+
+def test_plot_ratings(oper_traj):
+    """component boxes have an area proportional to the rating, relative to the load peak"""
+    from matplotlib.patches import FancyBboxPatch
+    mg, traj = oper_traj
+    assert mg.load_max == np.max(mg.load)
+    fig = mgs.plotting.plot_ratings(mg, unit='kW')
+    widths = [p.get_width() for p in fig.axes[0].patches
+              if isinstance(p, FancyBboxPatch)]
+    ratings = [mg.load_max, mg.generator.power_rated, mg.storage.energy_rated,
+               mg.nondispatchables['Solar PV'].power_rated]
+    assert widths == approx(np.sqrt(np.array(ratings)/mg.load_max))
+    # load peak should be positive
+    project, generator, battery = mg.project, mg.generator, mg.storage
+    for load in [np.zeros(100), np.zeros(0)]:
+        mg0 = mgs.Microgrid(project, load, generator, battery, {})
+        assert mg0.load_max == 0.
+        with raises(ValueError, match='load peak'):
+            mgs.plotting.plot_ratings(mg0)
+
+
+def test_lttb_indices():
+    """LTTB downsampling keeps end points and the shape of peaks"""
+    from microgrids.plotting import _lttb_indices
+    rng = np.random.default_rng(0)
+    n = 1000
+    x = np.arange(n)/24
+    y = rng.uniform(0., 1., n)
+    y[500] = 10. # peak
+    for n_out in [3, 10, 200, 999]:
+        idx = _lttb_indices(x, y, n_out)
+        assert len(idx) == n_out
+        assert idx[0] == 0 and idx[-1] == n-1
+        assert np.all(np.diff(idx) > 0)
+        assert 500 in idx
+    # no downsampling
+    for n_out in [n, n+1, 2]:
+        assert np.array_equal(_lttb_indices(x, y, n_out), np.arange(n))
+
+
+def test_active():
+    """`where` mask includes the instants next to active instants"""
+    from microgrids.plotting import _active
+    P = np.array([0., 1., 0., 0., 0., 2., 3., 0., 1.])
+    exp = np.array([1, 1, 1, 0, 1, 1, 1, 1, 1], dtype=bool)
+    assert np.array_equal(_active(P), exp)
+    P = np.array([1., 0., 0., 0.])
+    assert np.array_equal(_active(P), [True, True, False, False])
+    assert not np.any(_active(np.zeros(5)))